@@ -1,7 +1,7 @@
 from geojson import Feature
 from shapely.geometry import Polygon, LineString
 from turfpy.transformation import circle
-from hurricane.data.transform.domains import Domains
+from hurricane.utils.geo import haversine_one_to_many
 import numpy  as np
 
 class Box:
@@ -42,13 +42,10 @@ class Box:
         return Polygon(LineString(bbox))
 
     def create_cbox(self, distance_in_km=0.0):
-        distance = 0.0
-        domain = Domains(None, None)
-        bbox = self.create_bbox().exterior.coords
+        bbox = self.create_bbox()
         centroid = bbox.centroid
-        # Calculate distance [centroid-> max(box border)]
-        for p in bbox:
-            d = domain.get_distance(p[0],p[1], centroid.x, centroid.y)
-            if d > distance: distance = d        
+        # Calculate distance [centroid-> max(box border)], points are (lat, lon)
+        border = np.asarray(bbox.exterior.coords)
+        distance = haversine_one_to_many(centroid.x, centroid.y, border[:, 0], border[:, 1]).max()
         cbox = circle(center=Feature(geometry=centroid), radius = (distance + distance_in_km) * self.unit_degree, steps=64)
         return Polygon(LineString(cbox.geometry.coordinates[0]))
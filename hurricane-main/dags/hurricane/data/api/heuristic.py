@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 import os
-from shapely.geometry import Point
+import shapely
 from hurricane.data.api.box import Box
 from hurricane.data.api.config import Config
 from hurricane.data.extract.dimensions import Dimensions
@@ -18,8 +18,8 @@ class Heuristic:
             self.workdir    = self.model_config['datalake_workdir']
             self.datalake   = Datalake(self.model_config['datalake_client'], self.workdir)
             self.dimensions = Dimensions(self.datalake, self.workdir, self.engine)
-            self.segments   = self.dimensions.get_segments_from_silver()
-            self.vertices   = self.dimensions.get_vertices_from_silver()
+            self.segments   = self.dimensions.get_segments_from_silver(columns=['seg_id', 'ver_id_star', 'ver_id_final', 'length'])
+            self.vertices   = self.dimensions.get_vertices_from_silver(columns=['ver_id', 'lon', 'lat', 'zone_id'])
             self.zones      = self.dimensions.get_zones_from_database()
             if self.info_config is not None:
                 self.infos      = Infos(self.datalake, self.info_config['datalake_workdir'], self.info_config)
@@ -58,11 +58,8 @@ class Heuristic:
         else:         object_box = box.create_bbox(distance_in_km)
 
         # get all vertices in bounding box
-        l_vertices = []
-        for i, v in self.vertices.iterrows():
-            y, x  = v['vertice'].split(",", maxsplit=2)
-            p = Point(float(x), float(y))
-            if object_box.contains(p): l_vertices.append(v['ver_id'])
+        inside_box = shapely.contains_xy(object_box, self.vertices['lat'].to_numpy(), self.vertices['lon'].to_numpy())
+        l_vertices = self.vertices.loc[inside_box, 'ver_id'].to_list()
         
         segments_by_start = self.segments[self.segments['ver_id_star'].isin(l_vertices)]
         segments_by_final = self.segments[self.segments['ver_id_final'].isin(l_vertices)]
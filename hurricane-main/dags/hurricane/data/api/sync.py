@@ -37,7 +37,7 @@ class SyncDatabase:
         elif self.tablename == "time":
             create_table = f"create table if not exists {self.schema}.{self.tablename}( time_id integer NOT NULL, period character varying(32), weekday character varying(16), day integer, month integer, year integer)"
         elif self.tablename == "vertice":
-            create_table = f"create table if not exists {self.schema}.{self.tablename}( ver_id integer NOT NULL, vertice text NOT NULL, zone_id integer NOT NULL, district_id integer NOT NULL, neighborhood_id integer NOT NULL)"
+            create_table = f"create table if not exists {self.schema}.{self.tablename}( ver_id integer NOT NULL, lon double precision NOT NULL, lat double precision NOT NULL, zone_id integer NOT NULL, district_id integer NOT NULL, neighborhood_id integer NOT NULL)"
         else:
             create_table = f"create table if not exists {self.schema}.{self.tablename}( time_id integer NOT NULL, seg_id integer NOT NULL )"
             for interface in interfaces:
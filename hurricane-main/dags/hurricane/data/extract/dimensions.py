@@ -1,7 +1,11 @@
 import pandas as pd
 import numpy  as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from shapely import wkb
 
+from hurricane.utils.geo import VertexAdjacency
+
 class Dimensions:
     def __init__(self, datalake, workdir, engine=None):
         self.datalake = datalake
@@ -11,32 +15,61 @@ class Dimensions:
         self.bronze_vertices_file_path = f'{self.workdir}/bronze/vertice.parquet'
         self.silver_segment_file_path = f'{self.workdir}/silver/segment.parquet'
         self.silver_vertice_file_path = f'{self.workdir}/silver/vertice.parquet'
+        self.silver_vertice_index_file_path = f'{self.workdir}/silver/vertice_index.pickle'
+        self.silver_segment_adjacency_file_path = f'{self.workdir}/silver/segment_adjacency.npz'
         self.silver_historic_date_file_path = f'{self.workdir}/silver/model_historic_dates.parquet'
+        self.silver_prepared_segment_file_path = f'{self.workdir}/silver/prepared_segment.arrow'
 
-    def get_segments_from_bronze(self):
+    def get_segments_from_bronze(self, columns=None):
         if self.datalake.verify_file_exists(self.bronze_segments_file_path):
-            return self.datalake.read_parquet_file(self.bronze_segments_file_path)
+            return self.datalake.read_parquet_file(self.bronze_segments_file_path, columns=columns)
         else:
             return pd.DataFrame()
 
-    def get_vertices_from_bronze(self):
+    def get_vertices_from_bronze(self, columns=None):
         if self.datalake.verify_file_exists(self.bronze_vertices_file_path):
-            return self.datalake.read_parquet_file(self.bronze_vertices_file_path)
+            return self.datalake.read_parquet_file(self.bronze_vertices_file_path, columns=columns)
         else:
             return pd.DataFrame()
 
-    def get_segments_from_silver(self):
+    def get_segments_from_silver(self, columns=None, filters=None):
         if self.datalake.verify_file_exists(self.silver_segment_file_path):
-            return self.datalake.read_parquet_file(self.silver_segment_file_path)
+            return self.datalake.read_parquet_file(self.silver_segment_file_path, columns=columns, filters=filters)
         else:
             return pd.DataFrame()
 
-    def get_vertices_from_silver(self):
+    def get_vertices_from_silver(self, columns=None, filters=None):
         if self.datalake.verify_file_exists(self.silver_vertice_file_path):
-            return self.datalake.read_parquet_file(self.silver_vertice_file_path)
+            return self.datalake.read_parquet_file(self.silver_vertice_file_path, columns=columns, filters=filters)
         else:
             return pd.DataFrame()
 
+    def has_prepared_model_in_silver(self):
+        return self.datalake.verify_file_exists(self.silver_prepared_segment_file_path) and \
+               self.datalake.verify_file_exists(self.silver_vertice_index_file_path) and \
+               self.datalake.verify_file_exists(self.silver_segment_adjacency_file_path)
+
+    def get_prepared_segments_from_silver(self, seg_ids):
+        """
+        Return the prepared segments with the given ids.
+        The prepared model is memory mapped, only the selected rows are read.
+        """
+        segments = self.datalake.read_arrow_file(self.silver_prepared_segment_file_path)
+        segments = segments.filter(pc.is_in(segments['seg_id'], value_set=pa.array(np.unique(seg_ids), type=segments.schema.field('seg_id').type)))
+        return segments.to_pandas()
+
+    def get_vertice_index_from_silver(self):
+        if self.datalake.verify_file_exists(self.silver_vertice_index_file_path):
+            return self.datalake.read_pickle_file(self.silver_vertice_index_file_path)
+        else:
+            return None
+
+    def get_segment_adjacency_from_silver(self):
+        if self.datalake.verify_file_exists(self.silver_segment_adjacency_file_path):
+            return VertexAdjacency(**self.datalake.read_npz_file(self.silver_segment_adjacency_file_path))
+        else:
+            return None
+
     def get_historic_date_from_silver(self):
         if self.datalake.verify_file_exists(self.silver_historic_date_file_path):
             return self.datalake.read_parquet_file(self.silver_historic_date_file_path)
@@ -1,5 +1,11 @@
 import os
+import re
+import numpy  as np
 import pandas as pd
+from datetime import datetime
+
+from hurricane.schemas.files_schema import FilesSchema
+from hurricane.utils.geo import DEFAULT_CELL_SIZE
 
 class Infos:
     def __init__(self, datalake, workdir, config):
@@ -7,58 +13,170 @@ class Infos:
         self.workdir                = workdir
         self.config                 = config
         self.silver_columns_compare = ['KEY', 'DATE', 'PERIOD', 'LATITUDE', 'LONGITUDE', 'INFO']
+        self.bronze_columns         = ['KEY', 'DATE', 'PERIOD', 'LATITUDE', 'LONGITUDE']
         self.silver_path            = f"{workdir}/silver/"
         self.silver_historic_dates  = self.silver_path + "model_historic_dates.parquet"
+        self.silver_partitions      = self.silver_path + "partitions.json"
+        self.cell_size              = self.config.get('cell_size', DEFAULT_CELL_SIZE)
+        self.partition_target_rows  = self.config.get('partition_target_rows', 200000)
+        self.max_partitions         = self.config.get('max_partitions', 64)
         self.gold_path            = f"{workdir}/gold/"
         self.gold_info_file_path    = f"{workdir}/gold/{self.config['fact_tablename']}.parquet"
+        self.gold_info_pending_file_path = f"{workdir}/gold/{self.config['fact_tablename']}.pending.parquet"
+        self.silver_consumed_deltas = self.silver_path + f"{self.config['fact_tablename']}_consumed_deltas.json"
         self.files_infos            = [f"{self.workdir}/bronze/{v['name']}.parquet" for v in self.config['raw_interfaces']]
     
-    def get_infos_from_bronze(self):
-        df_infos = pd.DataFrame()
+    def get_infos_from_bronze(self, columns=None):
+        dataframes = []
         for file_info in self.files_infos:
             type_info = os.path.basename(file_info.rsplit('.', 1)[0])
             if self.datalake._verify_if_path_if_exists(file_info):
-                df = self.datalake.read_parquet_file(file_info)
-                df['INFO'] = type_info
-                df_infos = pd.concat([df_infos, df], ignore_index=True)
-        return df_infos
+                df = self.datalake.read_parquet_dataset(file_info, columns=columns)
+                df['INFO'] = pd.Series(type_info, index=df.index, dtype='category')
+                dataframes.append(df)
+        return FilesSchema.concat_dataframes(dataframes)
 
     def get_infos_partition_from_bronze(self, partition):
-        df_infos = pd.DataFrame()
+        # partition: item of the partitions manifest, its rows are read by the range of spatial cells
+        filters = []
+        if partition['cell_start'] is not None:
+            filters.append(('CELL', '>=', partition['cell_start']))
+        if partition['cell_end'] is not None:
+            filters.append(('CELL', '<', partition['cell_end']))
+
+        dataframes = []
         for file_info in self.files_infos:
             if self.datalake._verify_if_path_if_exists(file_info):
                 type_info = os.path.basename(file_info.rsplit('.', 1)[0])
-                df = self.datalake.read_parquet_file(file_info)
+                df = self.datalake.read_parquet_dataset(file_info, columns=self.bronze_columns, filters=filters or None)
                 df['LATITUDE']  = df['LATITUDE'].round(7).astype(float)
                 df['LONGITUDE'] = df['LONGITUDE'].round(7).astype(float)
-                df = df[df['LONGITUDE'].apply(lambda l: str(l).endswith(partition))]
                 if not df.empty:
-                    df['INFO'] = type_info
-                    df_infos = pd.concat([df_infos, df], ignore_index=True)
-        return df_infos.reset_index()
+                    df['INFO'] = pd.Series(type_info, index=df.index, dtype='category')
+                    dataframes.append(df)
+        return FilesSchema.concat_dataframes(dataframes).reset_index()
+
+    def get_partitions_from_silver(self):
+        if self.datalake.verify_file_exists(self.silver_partitions):
+            return self.datalake.read_json_file(self.silver_partitions)
+        else:
+            return None
+
+    def create_partitions(self):
+        """
+        Split the spatial cells of the bronze infos into contiguous ranges with about the same number of rows.
+        The number of partitions follows the data: about partition_target_rows rows by partition, up to max_partitions.
+        The first and the last ranges are open, so every cell has a partition.
+        Return None when bronze is empty.
+        """
+        cells = [self.datalake.read_parquet_dataset(file_info, columns=['CELL'])['CELL']
+                 for file_info in self.files_infos if self.datalake._verify_if_path_if_exists(file_info)]
+        cells = pd.concat(cells, ignore_index=True) if cells else pd.Series(dtype='int64')
+        if cells.empty:
+            return None
+
+        partition_ids = list(range(self.get_number_partitions(len(cells.index))))
 
-    def get_infos_partition_from_silver(self, split_key):
+        counts     = cells.value_counts().sort_index()
+        cumulative = counts.cumsum().to_numpy()
+        targets    = cumulative[-1] * np.arange(1, len(partition_ids)) / len(partition_ids)
+        positions  = np.minimum(np.searchsorted(cumulative, targets, side='right'), len(counts.index) - 1)
+        bounds     = [None] + [int(cell) for cell in counts.index[positions]] + [None]
+        return {
+            'cell_size'  : self.cell_size,
+            'partitions' : [{'id': int(p), 'cell_start': bounds[i], 'cell_end': bounds[i + 1]} for i, p in enumerate(partition_ids)]
+        }
+
+    def get_number_partitions(self, rows):
+        # about partition_target_rows rows by partition, up to max_partitions
+        return int(min(self.max_partitions, max(1, np.ceil(rows / self.partition_target_rows))))
+
+    def count_infos_from_bronze(self):
+        # number of bronze rows, from the manifests of the bronze datasets
+        return sum(self.datalake.read_parquet_dataset_manifest(file_info)['rows']
+                   for file_info in self.files_infos if self.datalake._verify_if_path_if_exists(file_info))
+
+    def is_partitions_outdated(self, partition_manifest):
+        """
+        Return True when the partitions must be planned again: the manifest is missing, it was built with another
+        cell size, or bronze grew (or shrank) to another number of partitions than the planned one.
+        """
+        if partition_manifest is None or partition_manifest['cell_size'] != self.cell_size:
+            return True
+        return len(partition_manifest['partitions']) != self.get_number_partitions(self.count_infos_from_bronze())
+
+    def get_infos_partition_from_silver(self, split_key, columns=None):
         dataframe = pd.DataFrame()
         filename  = self.get_infos_filename_partition(split_key)
         if self.datalake._verify_if_path_if_exists(filename):
-            dataframe = self.datalake.read_parquet_file(filename)
+            dataframe = self.datalake.read_parquet_file(filename, columns=columns)
         return dataframe
 
-    def get_all_infos_from_silver(self, number_partitions):
-        df_infos = pd.DataFrame()
-        for i in range(1, int(number_partitions)):
+    def get_partition_ids(self):
+        partition_manifest = self.get_partitions_from_silver()
+        if partition_manifest is None:
+            return []
+        return [partition['id'] for partition in partition_manifest['partitions']]
+
+    def list_infos_partitions_from_silver(self):
+        # every silver partition file, whatever the partitions manifest
+        if not self.datalake.verify_file_exists(self.silver_path):
+            return []
+        pattern = re.compile(rf"{re.escape(self.config['fact_tablename'])}_\d+\.parquet")
+        return [f for f in self.datalake.list_dir(self.silver_path) if pattern.fullmatch(os.path.basename(f))]
+
+    def get_all_infos_from_silver(self, columns=None):
+        dataframes = []
+        for i in self.get_partition_ids():
             filename  = self.get_infos_filename_partition(i)
             if self.datalake._verify_if_path_if_exists(filename):
-                df = self.datalake.read_parquet_file(filename)
-                df_infos = pd.concat([df_infos, df], ignore_index=True)
-        return df_infos.reset_index()
+                dataframes.append(self.datalake.read_parquet_file(filename, columns=columns))
+        return FilesSchema.concat_dataframes(dataframes).reset_index()
     
     def get_infos_filename_partition(self, partition):
         return self.silver_path + f"{self.config['fact_tablename']}_" + str(partition) + ".parquet"
     
-    def get_infos_from_gold(self):
+    def get_infos_delta_filename_partition(self, partition):
+        # rows added to the silver partition since the last gold aggregation
+        return self.silver_path + f"{self.config['fact_tablename']}_delta_" + str(partition) + ".parquet"
+
+    def get_infos_delta_partition_from_silver(self, partition, columns=None):
+        dataframe = pd.DataFrame()
+        filename  = self.get_infos_delta_filename_partition(partition)
+        if self.datalake._verify_if_path_if_exists(filename):
+            dataframe = self.datalake.read_parquet_file(filename, columns=columns)
+        return dataframe
+
+    def list_infos_deltas_from_silver(self):
+        if not self.datalake.verify_file_exists(self.silver_path):
+            return []
+        pattern = re.compile(rf"{re.escape(self.config['fact_tablename'])}_delta_\d+\.parquet")
+        return [f for f in self.datalake.list_dir(self.silver_path) if pattern.fullmatch(os.path.basename(f))]
+
+    def consume_infos_deltas_from_silver(self):
+        """
+        Rename the delta files to consumed files, so the rows written meanwhile by the partition tasks go to new
+        delta files. Return every consumed file, with the ones left by a failed run.
+        """
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        for filename in self.list_infos_deltas_from_silver():
+            consumed = filename.replace(f"{self.config['fact_tablename']}_delta_", f"{self.config['fact_tablename']}_consumed_").replace('.parquet', f'_{stamp}.parquet')
+            self.datalake.move_and_overwrite_file_from_to(filename, consumed)
+        return self.list_infos_consumed_from_silver()
+
+    def list_infos_consumed_from_silver(self):
+        if not self.datalake.verify_file_exists(self.silver_path):
+            return []
+        pattern = re.compile(rf"{re.escape(self.config['fact_tablename'])}_consumed_\d+_\d+\.parquet")
+        return sorted(f for f in self.datalake.list_dir(self.silver_path) if pattern.fullmatch(os.path.basename(f)))
+
+    def get_infos_consumed_from_silver(self, filenames, columns=None):
+        dataframes = [self.datalake.read_parquet_file(filename, columns=columns) for filename in filenames]
+        return FilesSchema.concat_dataframes(dataframes)
+
+    def get_infos_from_gold(self, columns=None):
         if self.datalake.verify_file_exists(self.gold_info_file_path):
-            return self.datalake.read_parquet_file(self.gold_info_file_path)
+            return self.datalake.read_parquet_file(self.gold_info_file_path, columns=columns)
         else:
             return pd.DataFrame()
 
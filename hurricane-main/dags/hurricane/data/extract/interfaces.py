@@ -12,15 +12,17 @@ class Interface:
     def from_bronze(self):
         dataframe = pd.DataFrame()
         if self.datalake._verify_if_path_if_exists(self.bronze_file_path):
-            dataframe = self.datalake.read_parquet_file(self.bronze_file_path)
+            dataframe = self.datalake.read_parquet_dataset(self.bronze_file_path)
         return dataframe
 
-    def from_raw(self):
-        files = self.datalake.list_dir(self.raw_path)        
-        df_raw_interface = pd.DataFrame()
+    def get_staging_file_path(self, index):
+        return f'{self.workdir}/bronze/{self.name}.staging.{index}.parquet'
+
+    def list_raw_files(self):
+        return self.datalake.list_dir(self.raw_path)
+
+    def from_raw_in_chunks(self, files, chunksize, dtype=None):
         for file in files:
-            print(f'Get data from raw file [{file}]')
-            dataframe = self.datalake.read_csv_file_on_dataframe(file, encoding = "utf-16", engine = 'python', header = 0)
-            df_raw_interface = df_raw_interface.append(dataframe)
-        
-        return df_raw_interface, files
\ No newline at end of file
+            print(f'Get data from raw file [{file}] in chunks of [{chunksize}] rows')
+            for dataframe in self.datalake.read_csv_file_in_chunks(file, chunksize, encoding = "utf-16", header = 0, dtype = dtype):
+                yield dataframe
@@ -1,9 +1,12 @@
-from math import cos, asin, sqrt
 from shapely.geometry import Point, Polygon, LineString
 import networkx as nx
 import osmnx as ox
 import pandas as pd
 import numpy as np
+import shapely
+
+from hurricane.utils.geo import NearestVertexIndex, PolygonIndex, VertexAdjacency, haversine, nearest_segments
+from hurricane.utils.sequence import IdSequence
 
 class Dimensions:
     def __init__(self, datalake, workdir):
@@ -11,161 +14,167 @@ class Dimensions:
         self.workdir  = workdir
 
     def get_nearest_segment_by_point(self, segments, find_point):
-        index_nearest_segment = 0
-        distance_nearest_segment = 99999999
-        point = np.array([find_point['lat'], find_point['lon']])
-        for index, s in segments.iterrows():
-            lon_star, lat_star = s['vertice_star'].split(",")
-            lon_final, lat_final = s['vertice_final'].split(",")
-            # Check Warning cases -> where the linestring is a circle, that is, the start and end points are equal 
-            if lon_star == lon_final and lat_star == lat_final:
-                lon_final = float(lon_final) - 0.000001
-            p1 = np.array([float(lat_star), float(lon_star)])
-            p2 = np.array([float(lat_final), float(lon_final)])            
-            distance_segment = np.linalg.norm(np.cross(p2 - p1, p1 - point))/np.linalg.norm(p2 - p1)            
-            if distance_segment < distance_nearest_segment:
-                distance_nearest_segment = distance_segment
-                index_nearest_segment = index
-
-        return segments.loc[index_nearest_segment]
+        lon = np.full(len(segments.index), find_point['lon'])
+        lat = np.full(len(segments.index), find_point['lat'])
+        nearest, _ = nearest_segments(
+            np.zeros(len(segments.index), dtype=int), lon, lat,
+            segments['lon_star'].to_numpy(),
+            segments['lat_star'].to_numpy(),
+            segments['lon_final'].to_numpy(),
+            segments['lat_final'].to_numpy())
+        return segments.iloc[nearest[0]]
+
+    def get_nearest_segments_by_points(self, df_points, df_segments, adjacency=None):
+        # df_points    = ['LATITUDE', 'LONGITUDE', 'ver_id'] where ver_id is the closest vertice of the point
+        # df_segments  = ['seg_id', 'ver_id_star', 'ver_id_final', 'lon_star', 'lat_star', 'lon_final', 'lat_final']
+        if adjacency is None:
+            adjacency = self.create_segment_adjacency(df_segments)
+
+        # candidates: every segment incident to the closest vertice of each point
+        point, seg_ids = adjacency.incident(df_points['ver_id'].to_numpy())
+        known          = np.isin(seg_ids, df_segments['seg_id'].to_numpy())
+        point, seg_ids = point[known], seg_ids[known]
+        segments = df_segments.set_index('seg_id').loc[seg_ids, ['lon_star', 'lat_star', 'lon_final', 'lat_final']]
+
+        nearest, _ = nearest_segments(
+            point,
+            df_points['LONGITUDE'].to_numpy(dtype=float)[point],
+            df_points['LATITUDE'].to_numpy(dtype=float)[point],
+            segments['lon_star'].to_numpy(),
+            segments['lat_star'].to_numpy(),
+            segments['lon_final'].to_numpy(),
+            segments['lat_final'].to_numpy())
+
+        # points whose closest vertice has no segment keep an empty seg_id
+        result = np.full(len(df_points.index), np.nan)
+        result[point[nearest]] = seg_ids[nearest]
+        return result
 
     def get_distance(self, lat1, lon1, lat2, lon2):
-        p   = 0.017453292519943295
-        hav = 0.5 - cos((lat2 - lat1) * p) / 2 + cos(lat1 * p) * cos(lat2 * p) * (1 - cos((lon2 - lon1) * p)) / 2
-        return 12742 * asin(sqrt(hav))
-
-    def get_closest_point(self, coordinates, xy):
-        # coordinates = {'id': ?, 'lat': ?, 'lon': ?}
-        return min(coordinates, key = lambda point: 
-            self.get_distance(xy['lat'], xy['lon'], point['lat'], point['lon'])
-        )
-    
+        return float(haversine(lat1, lon1, lat2, lon2))
+
+    def create_prepared_model(self, df_vertices, df_segments):
+        # Model ready for the infos: nearest vertice index, segments without the reverse way of the twoway ones
+        # and the vertice to segments adjacency
+        df_prepared_segments = self.filter_uniqueway_segments(df_segments)
+        vertice_index        = self.create_vertice_index(df_vertices)
+        segment_adjacency    = self.create_segment_adjacency(df_prepared_segments)
+        return vertice_index, df_prepared_segments, segment_adjacency
+
+    def create_vertice_index(self, df_vertices):
+        return NearestVertexIndex(df_vertices['ver_id'], df_vertices['lon'], df_vertices['lat'])
+
+    def create_segment_adjacency(self, df_segments):
+        # df_segments must be already filtered by filter_uniqueway_segments
+        return VertexAdjacency.from_segments(df_segments['seg_id'], df_segments['ver_id_star'], df_segments['ver_id_final'])
+
     def create_segments(self, gdf_edges):
-        precision = 7
-        segments = []
-        for index, line in gdf_edges.iterrows():
-            vertices = ox.utils_geo.redistribute_vertices(line['geometry'], 0.0009)
-            for i in range(len(vertices) - 1):
-                current_item = ox.utils_geo.round_geometry_coords(vertices[i], precision)
-                next_item = ox.utils_geo.round_geometry_coords(vertices[i + 1], precision)
-                distance = self.get_distance(current_item.x, current_item.y, next_item.x, next_item.y) * 1000 # transform in meters
-                segments.append([
-                    line['oneway'],
-                    line['name'] if type(line['name']) == list else [line['name']],
-                    line['highway'] if type(line['highway']) == list else [line['highway']],
-                    current_item, # start_ver
-                    next_item,    # final_ver
-                    round(distance, 2)])
-        df_segments = pd.DataFrame(segments,columns=['oneway', 'name', 'highway', 'star_ver', 'final_ver', 'length'])
-        df_segments['name'] = df_segments['name'].apply(lambda s: [] if s == [np.nan] else s)
-        df_segments = df_segments.loc[df_segments.astype(str).drop_duplicates().index]
+        precision  = 7
+        distance   = 0.0009
+        geometries = np.asarray(gdf_edges['geometry'])
+
+        # Redistribute the vertices of every edge at once (same rule as ox.utils_geo.redistribute_vertices)
+        num_vert = np.maximum(np.round(shapely.length(geometries) / distance).astype(int), 1)
+        edge     = np.repeat(np.arange(len(geometries)), num_vert + 1)
+        step     = np.arange(len(edge)) - np.repeat(np.cumsum(num_vert + 1) - (num_vert + 1), num_vert + 1)
+        points   = shapely.line_interpolate_point(geometries[edge], step / num_vert[edge], normalized=True)
+        coords   = np.round(shapely.get_coordinates(points), precision)
+
+        # Each vertex is linked to the next one of the same edge
+        star  = np.flatnonzero(step < num_vert[edge])
+        final = star + 1
+        edge  = edge[star]
+
+        names    = [n if type(n) == list else ([] if pd.isna(n) else [n]) for n in gdf_edges['name']]
+        highways = [h if type(h) == list else [h] for h in gdf_edges['highway']]
+
+        df_segments = pd.DataFrame({
+            'oneway'    : gdf_edges['oneway'].to_numpy()[edge],
+            'name'      : pd.Series(names, dtype=object).to_numpy()[edge],
+            'highway'   : pd.Series(highways, dtype=object).to_numpy()[edge],
+            'lon_star'  : coords[star, 0],
+            'lat_star'  : coords[star, 1],
+            'lon_final' : coords[final, 0],
+            'lat_final' : coords[final, 1],
+            'length'    : np.round(haversine(coords[star, 1], coords[star, 0], coords[final, 1], coords[final, 0]) * 1000, 2) # transform in meters
+        })
+
+        # Remove duplicated segments comparing numeric keys only (lists are compared by their codes)
+        df_keys = df_segments[['oneway', 'lon_star', 'lat_star', 'lon_final', 'lat_final', 'length']].copy()
+        df_keys['name']    = pd.factorize(pd.Series([str(n) for n in names]))[0][edge]
+        df_keys['highway'] = pd.factorize(pd.Series([str(h) for h in highways]))[0][edge]
+        df_segments = df_segments[~df_keys.duplicated()]
 
         # Generate Sequence Id
-        df_segments.reset_index(inplace=True, drop=True)
-        df_id = pd.DataFrame([number for number in range(1, len(df_segments.index))],columns=['seg_id'])
-        df_full_segments = pd.DataFrame()
-        df_full_segments = pd.concat([df_id, df_segments], axis=1, join='inner')
-        
-        # Transform Point to Pair
-        df_full_segments['star_ver'] = df_full_segments['star_ver'].apply(lambda row :  str(row.x) + "," + str(row.y))
-        df_full_segments['final_ver'] = df_full_segments['final_ver'].apply(lambda row : str(row.x) + "," + str(row.y))
-
-        return df_full_segments
+        return IdSequence.assign_ids(df_segments, 'seg_id', loc=0)
 
     def create_vertices(self, df_segments):
         # Create Vertices
-        star_ver  = df_segments['star_ver'].copy()
-        final_ver = df_segments['final_ver'].copy()
-        df_vertex = star_ver.append(final_ver, ignore_index=True)
-        df_vertex = pd.DataFrame(np.unique(df_vertex), columns={'vertice'})
-        df_vertex.reset_index(inplace=True, drop=True)
+        star_ver  = df_segments[['lon_star', 'lat_star']].to_numpy(dtype=float)
+        final_ver = df_segments[['lon_final', 'lat_final']].to_numpy(dtype=float)
+        df_vertex = pd.DataFrame(np.unique(np.concatenate([star_ver, final_ver]), axis=0), columns=['lon', 'lat'])
 
-        df_id = pd.DataFrame([number for number in range(1, len(df_vertex.index))],columns=['ver_id'])
-        df_full_vertex = pd.DataFrame()
-        df_full_vertex = pd.concat([df_id, df_vertex], axis=1, join='inner')
-
-        return df_full_vertex
+        # Generate Sequence Id
+        return IdSequence.assign_ids(df_vertex, 'ver_id', loc=0)
     
-    def associate_zones(self, df_vertex, df_zones):
-        df_vertex['zone_id'] = 0
-        for index_point, point in df_vertex.iterrows():
-            for _, zone in df_zones.iterrows():
-                x, y = point['vertice'].split(",", maxsplit=2)
-                if zone['geometry'].contains(Point(float(x), float(y))):
-                    df_vertex.loc[index_point, 'zone_id'] = zone['id']
-                    break
+    def associate_polygons(self, df_vertex, df_polygons, column_id):
+        # df_polygons must be sorted by priority, the first polygon that contains the vertex wins
+        index = PolygonIndex(df_polygons['geometry'], df_polygons['id'])
+        df_vertex[column_id] = index.associate(df_vertex['lon'].to_numpy(), df_vertex['lat'].to_numpy())
         return df_vertex
 
+    def associate_zones(self, df_vertex, df_zones):
+        return self.associate_polygons(df_vertex, df_zones, 'zone_id')
+
     def associate_districts(self, df_vertex, df_districts):
-        df_vertex['district_id'] = 0
-        for vid, point in df_vertex.iterrows():
-            x, y = point['vertice'].split(",", maxsplit=2)
-            p = Point(float(x), float(y))
-            for did, district in df_districts.iterrows():
-                if district['geometry'].contains(p):
-                    df_vertex.loc[vid, 'district_id'] = district['id']
-                    break
-        return df_vertex
+        return self.associate_polygons(df_vertex, df_districts, 'district_id')
 
     def associate_neighborhoods(self, df_vertex, df_neighborhoods):
-        df_vertex['neighborhood_id'] = 0
-        for vid, point in df_vertex.iterrows():
-            x, y = point['vertice'].split(",", maxsplit=2)
-            p = Point(float(x), float(y))
-            for nid, neighborhood in df_neighborhoods.iterrows():
-                if neighborhood['geometry'].contains(p):
-                    df_vertex.loc[vid, 'neighborhood_id'] = neighborhood['id']
-                    break
-        return df_vertex
+        return self.associate_polygons(df_vertex, df_neighborhoods, 'neighborhood_id')
 
     def merge_vertices_into_segments(self, df_vertices, df_segments):
-        df_final_segments = df_segments.merge(df_vertices, left_on=['star_ver'], right_on=['vertice'],  how='inner')
-        df_final_segments.rename(columns={"ver_id" : "ver_id_star"}, inplace=True)
-        df_final_segments.drop(columns=['star_ver', 'vertice', 'zone_id', 'district_id', 'neighborhood_id'], inplace=True, errors='ignore')
+        df_vertices = df_vertices[['ver_id', 'lon', 'lat']]
 
-        df_final_segments = df_final_segments.merge(df_vertices, left_on=['final_ver'], right_on=['vertice'],  how='inner')
-        df_final_segments.rename(columns={"ver_id" : "ver_id_final"}, inplace=True)
-        df_final_segments.drop(columns=['final_ver', 'vertice', 'zone_id', 'district_id', 'neighborhood_id'], inplace=True, errors='ignore')
+        df_final_segments = df_segments.merge(
+            df_vertices.rename(columns={"ver_id" : "ver_id_star", "lon" : "lon_star", "lat" : "lat_star"}),
+            on=['lon_star', 'lat_star'], how='inner')
+
+        df_final_segments = df_final_segments.merge(
+            df_vertices.rename(columns={"ver_id" : "ver_id_final", "lon" : "lon_final", "lat" : "lat_final"}),
+            on=['lon_final', 'lat_final'], how='inner')
         
         return df_final_segments
     
-    def transform_vertices_in_list(self, df):
-        vertices = []
-        for _, vertice in df.iterrows():
-            y, x = vertice['vertice'].split(",")
-            template = {
-                'ver_id' : vertice['ver_id'],
-                'lat'   : float(x),
-                'lon'   : float(y)
-            }
-            vertices.append(template)
-        return vertices
-
     def filter_uniqueway_segments(self, df_segments):
         oneway = df_segments[df_segments['oneway'] == True].copy()
-        twoway = df_segments[df_segments['oneway'] == False].copy()
-        waylist = []
-        for index, way in twoway.iterrows():
-            if way['ver_id_star'] > way['ver_id_final']:
-                star = way['ver_id_final']
-                final = way['ver_id_star']
-            else:
-                star = way['ver_id_star']
-                final = way['ver_id_final']
-
-            row = {
-                'seg_id' : way['seg_id'],
-                'oneway' : way['oneway'],
-                'name'   : way['name'],
-                'highway': way['highway'],
-                'length' : way['length'],
-                'ver_id_star' : star,
-                'ver_id_final' : final
-            }
-            waylist.append(row)
-        df_twoway_segments = way = pd.DataFrame.from_dict(waylist)
-        df_twoway_segments.sort_values(by=['ver_id_star', 'ver_id_final', 'seg_id'], inplace=True)
-        df_twoway_segments.drop_duplicates(subset=['ver_id_star', 'ver_id_final'], keep='first', inplace=True)
+        twoway = df_segments[df_segments['oneway'] == False]
+
+        # orient every twoway segment from the lowest to the highest vertex id
+        ver_id_star  = twoway['ver_id_star'].to_numpy()
+        ver_id_final = twoway['ver_id_final'].to_numpy()
+        swap         = ver_id_star > ver_id_final
+        star         = np.minimum(ver_id_star, ver_id_final)
+        final        = np.maximum(ver_id_star, ver_id_final)
+        seg_id       = twoway['seg_id'].to_numpy()
+
+        # keep the lowest seg_id of each (star, final) pair, sorted by (star, final, seg_id)
+        order = np.lexsort((seg_id, final, star))
+        first = np.r_[True, (star[order][1:] != star[order][:-1]) | (final[order][1:] != final[order][:-1])] if len(order) else np.zeros(0, dtype=bool)
+        keep  = order[first]
+
+        df_twoway_segments = pd.DataFrame({
+            'seg_id'       : seg_id[keep],
+            'oneway'       : twoway['oneway'].to_numpy()[keep],
+            'name'         : twoway['name'].to_numpy()[keep],
+            'highway'      : twoway['highway'].to_numpy()[keep],
+            'lon_star'     : np.where(swap, twoway['lon_final'], twoway['lon_star'])[keep],
+            'lat_star'     : np.where(swap, twoway['lat_final'], twoway['lat_star'])[keep],
+            'lon_final'    : np.where(swap, twoway['lon_star'], twoway['lon_final'])[keep],
+            'lat_final'    : np.where(swap, twoway['lat_star'], twoway['lat_final'])[keep],
+            'length'       : twoway['length'].to_numpy()[keep],
+            'ver_id_star'  : star[keep],
+            'ver_id_final' : final[keep]
+        })
         df_full_segments = pd.concat([oneway, df_twoway_segments], ignore_index=True)
         # Circular streets, where the start and end points are less than 100 meters
         df_full_segments = df_full_segments[~((df_full_segments['length'] == 0) | (df_full_segments['ver_id_star'] == df_full_segments['ver_id_final']))]
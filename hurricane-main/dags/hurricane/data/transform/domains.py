@@ -1,37 +1,90 @@
+import numpy  as np
 import pandas as pd
 
+from hurricane.utils.sequence import IdSequence
+
 class Domains:
     def __init__(self, datalake, workdir):
         self.datalake = datalake
         self.workdir  = workdir
         self.days_of_week = ['Segunda-Feira', 'Terça-Feira', 'Quarta-Feira', 'Quinta-Feira', 'Sexta-Feira', 'Sábado', 'Domingo']
-        self.bronze_time_file_path = f'{self.workdir}/bronze/time.parquet'
-        self.silver_time_file_path = f'{self.workdir}/silver/time.parquet'
+        self.bronze_time_file_path     = f'{self.workdir}/bronze/time.parquet'
+        self.silver_time_file_path     = f'{self.workdir}/silver/time.parquet'
+        self.silver_sequence_file_path = f'{self.workdir}/silver/sequences.json'
+        # time_key = yyyymmdd * period_code_base + period_code
+        self.period_code_base          = 100
         
     def get_times(self, df):
-        time_list = []
         df_occurrence_times = df[['PERIOD', 'DATE']].copy()
         df_occurrence_times.drop_duplicates(ignore_index=True, inplace=True)
         df_occurrence_times.dropna(how='any', inplace=True)
-        for index, row in df_occurrence_times.iterrows():
-            template = [{
-                'period'    : row['PERIOD'],
-                'weekday'   : self.days_of_week[row['DATE'].weekday()],
-                'day'       : row['DATE'].day,
-                'month'     : row['DATE'].month,
-                'year'      : row['DATE'].year
-            }]
-            time_list.extend(template)
-        df_times = pd.DataFrame(time_list)
+        df_times = self.get_date_fields(df_occurrence_times['DATE'])
+        df_times.insert(0, 'period', df_occurrence_times['PERIOD'].astype(str).to_numpy())
+        return df_times
+
+    def get_date_fields(self, dates):
+        # weekday (name), day, month and year of a datetime series, in one pass
+        dates = pd.to_datetime(dates)
+        return pd.DataFrame({
+            'weekday' : dates.dt.weekday.map(dict(enumerate(self.days_of_week))).to_numpy(),
+            'day'     : dates.dt.day.astype('int64').to_numpy(),
+            'month'   : dates.dt.month.astype('int64').to_numpy(),
+            'year'    : dates.dt.year.astype('int64').to_numpy()
+        })
+
+    def get_date_key(self, year, month, day):
+        # integer date yyyymmdd
+        return year.astype('int64') * 10000 + month.astype('int64') * 100 + day.astype('int64')
+
+    def get_period_codes(self, df_silver_times):
+        # period codes persisted in the silver time dimension
+        if df_silver_times is None or df_silver_times.empty or 'period_code' not in df_silver_times.columns:
+            return {}
+        df_codes = df_silver_times[['period', 'period_code']].drop_duplicates()
+        return dict(zip(df_codes['period'], df_codes['period_code'].astype('int64')))
+
+    def assign_period_codes(self, periods, period_codes):
+        # keep the known codes, the new periods get the next ones
+        new_periods  = sorted(set(pd.Series(periods).dropna().astype(str)).difference(period_codes))
+        start        = max(period_codes.values(), default=0) + 1
+        period_codes = dict(period_codes, **{period: start + i for i, period in enumerate(new_periods)})
+        if period_codes and max(period_codes.values()) >= self.period_code_base:
+            raise Exception(f'Too many periods [{len(period_codes)}] for the time key')
+        return period_codes
+
+    def add_time_key(self, df_times, period_codes):
+        df_times = df_times.copy()
+        df_times['period_code'] = df_times['period'].map(period_codes).astype('int64')
+        df_times['time_key']    = self.get_date_key(df_times['year'], df_times['month'], df_times['day']) * self.period_code_base + df_times['period_code']
         return df_times
 
+    def get_time_ids(self, df_silver_times, periods, dates):
+        """
+        Return the time_id of every (period, date), looking up the integer time key in the
+        sorted keys of the time dimension (-1 when the time is not in the dimension).
+        """
+        period_codes = self.get_period_codes(df_silver_times)
+        dates        = pd.to_datetime(dates)
+        codes        = pd.Series(np.asarray(periods, dtype=object)).map(period_codes).to_numpy(dtype=float)
+        found        = ~np.isnan(codes) & dates.notna().to_numpy()
+        time_keys    = np.zeros(len(codes), dtype='int64')
+        time_keys[found] = (self.get_date_key(dates.dt.year[found], dates.dt.month[found], dates.dt.day[found]).to_numpy() * self.period_code_base
+                            + codes[found].astype('int64'))
+
+        order       = np.argsort(df_silver_times['time_key'].to_numpy(), kind='stable')
+        sorted_keys = df_silver_times['time_key'].to_numpy()[order]
+        sorted_ids  = df_silver_times['time_id'].to_numpy()[order]
+        if len(sorted_keys) == 0:
+            return np.full(len(codes), -1, dtype='int64')
+        position    = np.minimum(np.searchsorted(sorted_keys, time_keys), len(sorted_keys) - 1)
+        found      &= sorted_keys[position] == time_keys
+        return np.where(found, sorted_ids[position], -1).astype('int64')
+
     def generate_id(self, dataframe, column_name_id, start_value=1):
-        df = dataframe.copy()
-        df = df.reset_index(drop=True)
-        if not dataframe.empty:
-            df[column_name_id] = 0
-            df[column_name_id] = df.apply(lambda line: line.index + start_value)
-        return df
+        return IdSequence.assign_ids(dataframe, column_name_id, start_value)
+
+    def get_time_sequence(self):
+        return IdSequence(self.datalake, self.silver_sequence_file_path, 'time_id')
         
     def get_times_from_bronze(self):
         if self.datalake.verify_file_exists(self.bronze_time_file_path):
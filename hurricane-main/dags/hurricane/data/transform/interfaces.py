@@ -1,8 +1,8 @@
-from numpy.lib.function_base import append
 import pandas as pd
 import numpy as np
 
 from hurricane.schemas.files_schema import FilesSchema
+from hurricane.utils.geo import DEFAULT_CELL_SIZE, grid_cells
 
 class Interface:
     def __init__(self, datalake, workdir, name, config):
@@ -14,7 +14,23 @@ class Interface:
     def _get_duplicated_key_columns(self):
         return self.config['duplicated_key']
 
-    def process(self, dataframe, dag_id):
+    def create_key(self, dataframe):
+        # key_type "hash": compact 64 bits hash of the key columns, otherwise the key columns joined by "|"
+        key_columns = self._get_duplicated_key_columns()
+        if self.config.get('key_type', 'str') == 'hash':
+            return pd.util.hash_pandas_object(dataframe[key_columns], index=False).to_numpy(dtype=np.uint64)
+        if dataframe.empty:
+            return pd.Series("", index=dataframe.index, dtype=object)
+        columns = [self._key_column_to_str(dataframe[column]) for column in key_columns]
+        return columns[0].str.cat(columns[1:], sep="|")
+
+    @staticmethod
+    def _key_column_to_str(column):
+        # str() of every value, the text of the keys already stored in bronze (built row by row):
+        # astype(str) renders the dates without the time and keeps the missing values missing
+        return column.astype(object).map(str)
+
+    def process(self, dataframe, dag_id, cell_size=DEFAULT_CELL_SIZE):
         # Read parquet file in datalake
         df_interface = dataframe.copy()
         
@@ -40,9 +56,7 @@ class Interface:
         df_interface.drop_duplicates(subset=self._get_duplicated_key_columns(), inplace=True, ignore_index=True, keep='last')
         
         # Insert duplicated key into dataframe 
-        df_interface['KEY'] = ""
-        for index, row in df_interface.iterrows():
-            df_interface.loc[index, 'KEY'] = "|".join(row[self._get_duplicated_key_columns()].astype(str))
+        df_interface['KEY'] = self.create_key(df_interface)
 
         df_interface.rename(
             columns={
@@ -53,4 +67,10 @@ class Interface:
             }, inplace = True, errors='ignore'
         )
 
+        # Spatial grid cell, used to split the infos into spatial partitions
+        df_interface['CELL'] = self.create_cell(df_interface, cell_size)
+
         return df_interface
+
+    def create_cell(self, dataframe, cell_size=DEFAULT_CELL_SIZE):
+        return grid_cells(dataframe['LONGITUDE'].to_numpy(dtype=float), dataframe['LATITUDE'].to_numpy(dtype=float), cell_size)
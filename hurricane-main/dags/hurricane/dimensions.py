@@ -2,7 +2,7 @@ import json
 
 from airflow import DAG
 from datetime import datetime
-from airflow.operators.python_operator import PythonOperator
+from airflow.operators.python import PythonOperator
 from airflow.operators.trigger_dagrun import TriggerDagRunOperator
 from sqlalchemy import create_engine
 
@@ -1,6 +1,6 @@
 from airflow import DAG
 from datetime import datetime, timedelta
-from airflow.operators.python_operator import PythonOperator
+from airflow.operators.python import PythonOperator
 from airflow.operators.dummy_operator import DummyOperator
 from hurricane.utils.airflow_variable import AirflowVariable
 from hurricane.tasks.process_generate_heuristic_files import Heuristic
@@ -1,12 +1,13 @@
 import json
 
 from airflow import DAG
-from airflow.operators.python_operator import PythonOperator
+from airflow.operators.python import PythonOperator
 from datetime import datetime
 
 from hurricane.data.api.config import Config
 from hurricane.utils.airflow_variable import AirflowVariable
 from hurricane.utils.datalake import Datalake
+from hurricane.utils.geo import DEFAULT_CELL_SIZE
 from hurricane.schemas.tasks.raw_validations import RawValidations
 from hurricane.tasks.process_raw_interface import Interface
 from hurricane.tasks.process_domains import Domains
@@ -19,7 +20,6 @@ datalake     = Datalake(None, None)
 config_files = datalake.list_dir(config_path)
 
 def create_dag(config, related_config):
-    number_partitions = 10
     dag = DAG(
         dag_id = config['dag_id'],
         schedule_interval = config['schedule_interval'],
@@ -59,7 +59,8 @@ def create_dag(config, related_config):
                     'adl'           : config['datalake_client'],
                     'workdir'       : config['datalake_workdir'],
                     'interface_name': raw['name'],
-                    'config_json'   : raw
+                    'config_json'   : raw,
+                    'cell_size'     : config.get('cell_size', DEFAULT_CELL_SIZE)
                 }
             )
             raw_interface_process.append(task)
@@ -96,12 +97,10 @@ def create_dag(config, related_config):
         process_check_model_and_info = PythonOperator(
             task_id = f"process_check_model_and_info",
             python_callable = Infos.process_check_model_and_info,
-            provide_context=True,
             op_kwargs = {
                 'dag_id'                : config['dag_id'],
                 'adl'                   : config['datalake_client'],
                 'workdir'               : config['datalake_workdir'],
-                'number_partitions'     : number_partitions,
                 'config_json'           : config,
                 'related_config_json'   : related_config
             }
@@ -112,33 +111,30 @@ def create_dag(config, related_config):
         process_info = PythonOperator(
             task_id = f"process_{config['fact_tablename']}",
             python_callable = Infos.process_infos,
+            trigger_rule = 'none_failed',
             op_kwargs = {
                 'dag_id'                : config['dag_id'],
                 'adl'                   : config['datalake_client'],
                 'workdir'               : config['datalake_workdir'],
-                'number_partitions'     : number_partitions,
                 'config_json'           : config
             }
         )
 
-        info_silver_tasks = []
-        for i in range(1, number_partitions):
-            partition = str(i)
-            info_task_partition = PythonOperator(
-                task_id = f"process_{config['fact_tablename']}_partition_{partition}",
-                python_callable=Infos.process_silver_infos,
-                op_kwargs = {
-                    'dag_id'                : config['dag_id'],
-                    'adl'                   : config['datalake_client'],
-                    'workdir'               : config['datalake_workdir'],
-                    'partition'             : partition,
-                    'config_json'           : config,
-                    'related_config_json'   : related_config
-                }
-            )
-            info_silver_tasks.append(info_task_partition)
-            process_check_model_and_info.set_downstream(info_task_partition)
-            info_task_partition.set_downstream(process_info)
+        # One task by spatial partition of the manifest (dynamic task mapping), only the partition is mapped
+        info_silver_tasks = PythonOperator.partial(
+            task_id = f"process_{config['fact_tablename']}_partition",
+            python_callable = Infos.process_silver_infos,
+            op_kwargs = {
+                'dag_id'                : config['dag_id'],
+                'adl'                   : config['datalake_client'],
+                'workdir'               : config['datalake_workdir'],
+                'config_json'           : config,
+                'related_config_json'   : related_config
+            }
+        ).expand(op_args = process_check_model_and_info.output)
+
+        process_check_model_and_info.set_downstream(info_silver_tasks)
+        info_silver_tasks.set_downstream(process_info)
 
         sync_vertice_in_postgresql = PythonOperator(
             task_id = f"sync_vertice_in_postgresql",
@@ -2,7 +2,14 @@ import os
 import json
 import pandas as pd
 import numpy as np
+
+from functools import partial
+from pandas.api.types import union_categoricals
+
 class FilesSchema:
+    # conversion plan by schema columns
+    _conversion_plans = {}
+
     def __init__(self, dag_id):
         self.dag_id = dag_id
 
@@ -33,6 +40,24 @@ class FilesSchema:
         required_columns = self.get_required_columns(schema)
         return self.__validate_columns(required_columns, columns)
 
+    def validate_sample_types(self, schema, dataframe):
+        # dataframe: sampled rows read as strings, returns {column: (invalid values, filled values)}
+        plan = self.get_conversion_plan(schema)
+        converters = {column: self.to_float for column in plan['int'] + plan['float']}
+        converters.update({column: partial(self.to_date, date_format=date_format) for column, date_format in plan['date']})
+        invalid_columns = {}
+        for column in dataframe.columns:
+            if column not in converters:
+                continue
+            values = dataframe[column].dropna()
+            values = values[values.str.strip() != '']
+            if values.empty:
+                continue
+            invalid = int(converters[column](values).isna().sum())
+            if invalid > 0:
+                invalid_columns[column] = (invalid, len(values.index))
+        return invalid_columns
+
     def get_required_columns_type(self, schema):
         if schema is None:
             return None
@@ -49,22 +74,96 @@ class FilesSchema:
             return None
         return type_columns
 
+    def get_conversion_plan(self, schema):
+        """
+        Compile (once per schema) the columns of each type and the date formats.
+        Return {'str': [columns], 'category': [columns], 'int': [columns], 'float': [columns], 'date': [(column, format)]}.
+        """
+        plan_key = json.dumps(schema['columns'], sort_keys=True)
+        if plan_key not in FilesSchema._conversion_plans:
+            plan = {'str': [], 'category': [], 'int': [], 'float': [], 'date': []}
+            for column in schema['columns']:
+                ctype = column['type'].upper()
+                if ctype in ['STR', 'STRING']:
+                    plan['str'].append(column['name'])
+                elif ctype == 'CATEGORY':
+                    plan['category'].append(column['name'])
+                elif ctype in ['INT', 'INTEGER']:
+                    plan['int'].append(column['name'])
+                elif ctype in ['FLOAT', 'DECIMAL']:
+                    plan['float'].append(column['name'])
+                elif ctype in ['DATE', 'DATETIME']:
+                    plan['date'].append((column['name'], column.get('format')))
+                else:
+                    raise Exception(f"Column [{column['name']}] conversion failed to [{ctype}]")
+            FilesSchema._conversion_plans[plan_key] = plan
+        return FilesSchema._conversion_plans[plan_key]
+
+    def get_read_dtypes(self, schema):
+        # Every layout column is read as text, the conversion plan types them in a single pass
+        if schema is None:
+            return None
+        return {column['name'] : str for column in schema['columns']}
+
+    @staticmethod
+    def to_int(values):
+        values = pd.to_numeric(values, errors='coerce')
+        if values.dtype.kind == 'f':
+            values = np.trunc(values)
+        return values.astype('Int64')
+
+    @staticmethod
+    def to_float(values):
+        if not pd.api.types.is_numeric_dtype(values):
+            values = values.astype(str).str.replace(',', '.', regex=False)
+        return pd.to_numeric(values, errors='coerce').astype(float)
+
+    @staticmethod
+    def to_date(values, date_format=None):
+        if date_format is not None:
+            return pd.to_datetime(values, format=date_format, errors="coerce")
+        return pd.to_datetime(values, errors="coerce")
+
     def convert_columns_by_type(self, df, schema):
         if df is None or df.empty:
             return df
-        column_types = self.get_columns_type(schema)
-        for column in df.columns:
-            ctype = column_types[column].upper()
-            if ctype in ['STR', 'STRING']:
-                df[column] = df[column].apply(str)
-                df[column].replace(np.nan, '', regex=True)
-            elif ctype in ['INT', 'INTEGER']:
-                df[column] = pd.to_numeric(df[column], errors='coerce').astype(int)
-            elif ctype in ['FLOAT', 'DECIMAL']:
-                df[column] = df[column].apply(lambda row: str(row).replace(',','.'))
-                df[column] = pd.to_numeric(df[column], errors='coerce').astype(float)
-            elif ctype in ['DATE', 'DATETIME']:
-                df[column] = pd.to_datetime(df[column], errors="coerce")
-            else:
-                raise Exception(f'Column [{column}] conversion failed to [{ctype}]')       
+        plan    = self.get_conversion_plan(schema)
+        unknown = set(df.columns).difference(plan['str'], plan['category'], plan['int'], plan['float'], [c for c, _ in plan['date']])
+        if unknown:
+            raise Exception(f'Columns {sorted(unknown)} do not exist in the schema')
+
+        str_columns = [c for c in plan['str'] if c in df.columns]
+        if str_columns:
+            df[str_columns] = df[str_columns].astype(str)
+        # category: text column stored dictionary encoded (kept as such by parquet)
+        category_columns = [c for c in plan['category'] if c in df.columns]
+        if category_columns:
+            df[category_columns] = df[category_columns].astype(str).astype('category')
+        for column in plan['int']:
+            if column in df.columns:
+                df[column] = self.to_int(df[column])
+        for column in plan['float']:
+            if column in df.columns:
+                df[column] = self.to_float(df[column])
+        for column, date_format in plan['date']:
+            if column in df.columns:
+                df[column] = self.to_date(df[column], date_format)
         return df
+
+    @staticmethod
+    def concat_dataframes(dataframes):
+        """
+        Concatenate dataframes keeping the categorical columns as categorical:
+        the categories of a column that is categorical in any dataframe are unified before the concat
+        (pandas falls back to object when they differ).
+        """
+        dataframes = [df for df in dataframes if not (df.empty and len(df.columns) == 0)]
+        if not dataframes:
+            return pd.DataFrame()
+        columns = set.intersection(*[set(df.columns) for df in dataframes])
+        for column in columns:
+            if any(isinstance(df[column].dtype, pd.CategoricalDtype) for df in dataframes):
+                values     = [df[column].astype('category') for df in dataframes]
+                categories = union_categoricals(values, ignore_order=True).categories
+                dataframes = [df.assign(**{column: value.cat.set_categories(categories)}) for df, value in zip(dataframes, values)]
+        return pd.concat(dataframes, ignore_index=True)
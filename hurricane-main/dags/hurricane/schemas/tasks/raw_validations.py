@@ -1,3 +1,4 @@
+from functools import partial
 from hurricane.schemas.files_schema import FilesSchema
 from hurricane.utils.datalake import Datalake
 
@@ -22,12 +23,25 @@ class RawValidations:
                 print(f"There are no files to process [{key['input_path']}]")
                 continue
 
-            for file in files:
+            read_header  = partial(RawValidations.read_file_header, datalake, key.get('validation_sample_rows', 0))
+            files_header = datalake.map_files(read_header, files, key.get('max_workers', 1), key.get('worker_type', 'thread'))
+
+            for file, dataframe in zip(files, files_header):
                 print("----------------------------------------------")
                 print(f"Check this file [{file}]")
                 print("----------------------------------------------")
-                dataframe = datalake.read_csv_file_on_dataframe(file, encoding = "utf-16", engine = 'python', header = 0) 
                 columns = dataframe.columns.tolist()
                 is_valid, diff = files_schema.validate_file_schema(key, columns)
                 if not is_valid:
-                    raise ValueError(f"The {diff} columns do not exist in the file [{file}]")
\ No newline at end of file
+                    raise ValueError(f"The {diff} columns do not exist in the file [{file}]")
+
+                # Sampled rows: a column without any valid value has the wrong type (or is misplaced)
+                invalid_columns = files_schema.validate_sample_types(key, dataframe)
+                for column, (invalid, total) in invalid_columns.items():
+                    print(f"Warning: [{invalid}/{total}] sampled values of column [{column}] can not be converted in the file [{file}]")
+                wrong_columns = [column for column, (invalid, total) in invalid_columns.items() if invalid == total]
+                if wrong_columns:
+                    raise ValueError(f"The {wrong_columns} columns do not match their types in the file [{file}]")
+
+    def read_file_header(datalake, sample_rows, file):
+        return datalake.read_csv_header_on_dataframe(file, encoding = "utf-16", sample_rows = sample_rows)
\ No newline at end of file
@@ -41,6 +41,12 @@ class Dimensions:
 
             print(f"Backup file, move [{extract.silver_segment_file_path}] to [{segment_historic_path}]")
             datalake.move_file_to_historic(extract.silver_segment_file_path, segment_historic_path, suffix = "", append_date=True)
+
+            for index_file_path in [extract.silver_vertice_index_file_path, extract.silver_segment_adjacency_file_path,
+                                    extract.silver_prepared_segment_file_path]:
+                if datalake.verify_file_exists(index_file_path):
+                    print(f"Remove the index of the previous model [{index_file_path}]")
+                    datalake.remove_file(index_file_path)
             datalake.write_parquet_file_from_dataframe(extract.silver_historic_date_file_path, df_historic_dates)
 
         places = []
@@ -139,7 +145,11 @@ class Dimensions:
         df_bronze_vertices = datalake.read_parquet_file(extract.bronze_vertices_file_path)
         df_bronze_segments = datalake.read_parquet_file(extract.bronze_segments_file_path)
         df_silver_segments = transform.merge_vertices_into_segments(df_bronze_vertices, df_bronze_segments)
+        vertice_index, df_prepared_segments, segment_adjacency = transform.create_prepared_model(df_bronze_vertices, df_silver_segments)
 
         datalake.write_parquet_file_from_dataframe(extract.silver_vertice_file_path, df_bronze_vertices)
         datalake.write_parquet_file_from_dataframe(extract.silver_segment_file_path, df_silver_segments)
+        datalake.write_pickle_file(extract.silver_vertice_index_file_path, vertice_index)
+        datalake.write_npz_file(extract.silver_segment_adjacency_file_path, segment_adjacency.to_dict())
+        datalake.write_arrow_file(extract.silver_prepared_segment_file_path, df_prepared_segments)
 
@@ -14,7 +14,7 @@ class Domains:
         info     = ExtractInfos(datalake, workdir, config)
         domain   = TransformDomains(datalake, workdir)
 
-        df_infos = info.get_infos_from_bronze()
+        df_infos = info.get_infos_from_bronze(columns=['DATE', 'PERIOD'])
         df_times = domain.get_times(df_infos)
                 
         datalake.write_parquet_file_from_dataframe(domain.bronze_time_file_path, df_times)
@@ -29,14 +29,25 @@ class Domains:
         df_bronze_times = domain.get_times_from_bronze()
         df_silver_times = domain.get_times_from_silver()
 
+        # integer time key (yyyymmdd and period code), the period codes are kept in the silver time dimension
+        has_time_key    = df_silver_times is not None and 'time_key' in df_silver_times.columns
+        period_codes    = domain.get_period_codes(df_silver_times)
+        known_periods   = [] if has_time_key or df_silver_times is None or df_silver_times.empty else df_silver_times['period'].tolist()
+        period_codes    = domain.assign_period_codes(known_periods + df_bronze_times['period'].tolist(), period_codes)
+        df_bronze_times = domain.add_time_key(df_bronze_times, period_codes)
+
+        # time ids are allocated after the high-water mark kept in silver
+        sequence = domain.get_time_sequence()
         if df_silver_times is None or df_silver_times.empty:
-            time_dimension = domain.generate_id(df_bronze_times, 'time_id')
+            sequence.reset()
+            time_dimension = df_bronze_times.assign(time_id=sequence.allocate(len(df_bronze_times.index)))
             datalake.write_parquet_file_from_dataframe(domain.silver_time_file_path, time_dimension)
         else:
-            next_id = ( df_silver_times['time_id'].max() + 1 )
-            silver_compare = df_silver_times.loc[:, df_silver_times.columns != 'time_id']
-            diff = df_bronze_times.merge(silver_compare, how = 'outer' ,indicator=True).loc[lambda x : x['_merge']=='left_only']
-            partial_dimension = domain.generate_id(diff, 'time_id', next_id)
-            time_dimension = pd.concat([df_silver_times, partial_dimension])
-            time_dimension = time_dimension.drop(['_merge'], errors='ignore', axis=1)
+            if not has_time_key:
+                df_silver_times = domain.add_time_key(df_silver_times, period_codes)
+            if sequence.last_value() is None:
+                sequence.reset(df_silver_times['time_id'].max())
+            diff = df_bronze_times[~df_bronze_times['time_key'].isin(df_silver_times['time_key'])]
+            partial_dimension = diff.assign(time_id=sequence.allocate(len(diff.index)))
+            time_dimension = pd.concat([df_silver_times, partial_dimension], ignore_index=True)
             datalake.write_parquet_file_from_dataframe(domain.silver_time_file_path, time_dimension)
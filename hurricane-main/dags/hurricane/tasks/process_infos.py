@@ -3,6 +3,7 @@ from hurricane.data.extract.dimensions import Dimensions as ExtractDimensions
 from hurricane.data.transform.dimensions import Dimensions as TransformDimensions
 from hurricane.data.transform.domains import Domains as TransformDomains
 from hurricane.data.extract.infos import Infos as ExtractInfos
+from hurricane.schemas.files_schema import FilesSchema
 
 import pandas as pd
 import numpy as np
@@ -12,7 +13,6 @@ class Infos:
         dag_id          = args['dag_id']
         adl             = args['adl']
         workdir         = args['workdir']
-        partitions       = args['number_partitions']
         config          = args['config_json']
         related_config  = args['related_config_json']
         datalake        = Datalake(adl, dag_id)
@@ -32,23 +32,53 @@ class Infos:
             else:
                 print("The latest version of the template has been changed!")
                 model_changed = True
-                for p in range(1, partitions):
-                    filename = info.get_infos_filename_partition(p)
-                    if datalake.verify_file_exists(filename):
-                        print(f'Backup file, move [{filename}] to [{info.silver_path + "historic/"}]')
-                        datalake.move_file_to_historic(filename, info.silver_path + "historic/", suffix = "", append_date=True)
-                if datalake.verify_file_exists(info.gold_info_file_path):
-                    print(f'Backup file, move [{info.gold_info_file_path}] to [{info.gold_path + "historic/"}]')
-                    datalake.move_file_to_historic(info.gold_info_file_path, info.gold_path + "historic/", suffix = "", append_date=True)
+                Infos.backup_silver_and_gold(datalake, info)
                 datalake.write_parquet_file_from_dataframe(info.silver_historic_dates, df_model_historic_dates)
+
+        # Spatial partitions: rebuilt with the model, when missing, built with another cell size,
+        # or when bronze moved past the target rows of the planned partitions
+        partition_manifest = info.get_partitions_from_silver()
+        if model_changed or info.is_partitions_outdated(partition_manifest):
+            new_partition_manifest = info.create_partitions()
+            if new_partition_manifest is not None:
+                if not model_changed:
+                    # The silver partitions do not match the new ranges anymore
+                    print("The spatial partitions have been changed!")
+                    model_changed = True
+                    Infos.backup_silver_and_gold(datalake, info)
+                datalake.write_json_file(info.silver_partitions, new_partition_manifest)
+
+        # Model prepared before the partitions (models built before the prepared model existed)
+        if not extract.has_prepared_model_in_silver():
+            print(f"Prepared model not found, building it from [{extract.silver_segment_file_path}]")
+            transform = TransformDimensions(datalake, related_config['datalake_workdir'])
+            vertice_index, df_prepared_segments, segment_adjacency = transform.create_prepared_model(extract.get_vertices_from_silver(), extract.get_segments_from_silver())
+            datalake.write_pickle_file(extract.silver_vertice_index_file_path, vertice_index)
+            datalake.write_arrow_file(extract.silver_prepared_segment_file_path, df_prepared_segments)
+            datalake.write_npz_file(extract.silver_segment_adjacency_file_path, segment_adjacency.to_dict())
         
         args['ti'].xcom_push(key="model_changed", value=model_changed)
 
-    def process_silver_infos(**args):
+        # Positional arguments of the partition tasks (mapped over the return value): the partition of the manifest
+        partition_manifest = info.get_partitions_from_silver()
+        partitions         = partition_manifest['partitions'] if partition_manifest is not None else []
+        print(f"[{len(partitions)}] spatial partitions to process")
+        return [[partition] for partition in partitions]
+
+    def backup_silver_and_gold(datalake, info):
+        for filename in info.list_infos_partitions_from_silver():
+            if datalake.verify_file_exists(filename):
+                print(f'Backup file, move [{filename}] to [{info.silver_path + "historic/"}]')
+                datalake.move_file_to_historic(filename, info.silver_path + "historic/", suffix = "", append_date=True)
+        if datalake.verify_file_exists(info.gold_info_file_path):
+            print(f'Backup file, move [{info.gold_info_file_path}] to [{info.gold_path + "historic/"}]')
+            datalake.move_file_to_historic(info.gold_info_file_path, info.gold_path + "historic/", suffix = "", append_date=True)
+
+    def process_silver_infos(cell_range, **args):
         dag_id          = args['dag_id']
         adl             = args['adl']
         workdir         = args['workdir']
-        partition       = args['partition']
+        partition       = cell_range['id']
         config          = args['config_json']
         related_config  = args['related_config_json']
         datalake        = Datalake(adl, dag_id)
@@ -56,22 +86,11 @@ class Infos:
         extract         = ExtractDimensions(datalake, related_config['datalake_workdir'])
         transform       = TransformDimensions(datalake, related_config['datalake_workdir'])
 
-        df_bronze_partition = info.get_infos_partition_from_bronze(partition)
+        df_bronze_partition = info.get_infos_partition_from_bronze(cell_range)
         
         if not df_bronze_partition.empty:
             df_silver_partition = info.get_infos_partition_from_silver(partition)
-            df_silver_segments  = transform.filter_uniqueway_segments(extract.get_segments_from_silver())
-            df_silver_vertices  = extract.get_vertices_from_silver()
-            vertices_list       = transform.transform_vertices_in_list(df_silver_vertices)
-
-            df_full_segments    = df_silver_segments.merge(df_silver_vertices, left_on=['ver_id_star'], right_on=['ver_id'])
-            df_full_segments    = df_full_segments.drop(['ver_id', 'zone_id'], axis=1)
-            df_full_segments.rename(columns = {"vertice": "vertice_star"}, inplace=True)
-
-            df_full_segments    = df_full_segments.merge(df_silver_vertices, left_on=['ver_id_final'], right_on=['ver_id'])
-            df_full_segments    = df_full_segments.drop(['ver_id', 'zone_id'], axis=1)
-            df_full_segments.rename(columns = {'vertice': 'vertice_final'}, inplace = True)
-                    
+
             df_bronze_partition = df_bronze_partition.sort_values(['LATITUDE','LONGITUDE'])
             df_bronze_partition = df_bronze_partition[info.silver_columns_compare]
             df_bronze_partition.dropna(subset=['LATITUDE','LONGITUDE', 'DATE'], inplace=True)
@@ -83,52 +102,100 @@ class Infos:
             else:
                 diff = df_bronze_partition.copy()
 
-            grouped_infos_by_latlon = diff.groupby(['LATITUDE','LONGITUDE'])
-
-            for _, group in grouped_infos_by_latlon:
-                # get the closest vertice id
-                find = {'lat': float(group['LATITUDE'].iloc[0]), 'lon': float(group['LONGITUDE'].iloc[0])}
-                closest_vertice = transform.get_closest_point(vertices_list, find)
-                # based on the vertice id found get the segment id 
-                filter = (df_full_segments['ver_id_star'] == closest_vertice['ver_id']) | (df_full_segments['ver_id_final'] == closest_vertice['ver_id'])
-                closest_segments = df_full_segments[filter].reset_index(drop=True)
-                if len(closest_segments.index) > 1:
-                    closest_vertice = transform.get_nearest_segment_by_point(closest_segments, find)
-                    diff.loc[group.index, 'seg_id'] = closest_vertice['seg_id']
-                else:
-                    diff.loc[group.index, 'seg_id'] = closest_segments['seg_id'].iloc[0]
-
-            df_infos = pd.concat([df_silver_partition, diff], ignore_index=True)
+            # The vertice index and the adjacency are built once per model, only the candidate segments are read
+            df_points = diff[['LATITUDE', 'LONGITUDE']].drop_duplicates(ignore_index=True)
+            df_points['seg_id'] = np.nan
+            if not df_points.empty:
+                vertice_index     = extract.get_vertice_index_from_silver()
+                segment_adjacency = extract.get_segment_adjacency_from_silver()
+                # get the closest vertice id of every distinct point in one query
+                df_points['ver_id'], _ = vertice_index.query(df_points['LONGITUDE'].to_numpy(), df_points['LATITUDE'].to_numpy())
+                _, seg_ids             = segment_adjacency.incident(df_points['ver_id'].to_numpy())
+                df_full_segments       = extract.get_prepared_segments_from_silver(seg_ids)
+                print(f"Partition [{partition}]: [{len(df_points.index)}] points and [{len(df_full_segments.index)}] candidate segments")
+                # based on the vertice id found get the nearest segment id
+                df_points['seg_id'] = transform.get_nearest_segments_by_points(df_points, df_full_segments, segment_adjacency)
+            diff = diff.drop(columns=['seg_id'], errors='ignore').merge(df_points[['LATITUDE', 'LONGITUDE', 'seg_id']], on=['LATITUDE', 'LONGITUDE'], how='left')
+
+            df_infos = FilesSchema.concat_dataframes([df_silver_partition, diff])
             df_infos = df_infos.drop(['_merge'], errors='ignore', axis=1)
             df_infos.reset_index(drop=True, inplace=True)
 
+            # The new rows are kept apart for the gold aggregation, a retry after a failed run must not count them twice
+            df_delta = diff[info.silver_columns_compare + ['seg_id']]
+            df_delta = FilesSchema.concat_dataframes([info.get_infos_delta_partition_from_silver(partition), df_delta])
+            df_delta = df_delta.drop_duplicates(subset=info.silver_columns_compare, keep='last')
+
+            datalake.write_parquet_file_from_dataframe(info.get_infos_delta_filename_partition(partition), df_delta)
             datalake.write_parquet_file_from_dataframe(info.get_infos_filename_partition(partition), df_infos)
 
     def process_infos(**args):
-        number_partitions = args['number_partitions']
-        
-        dag_id    = args['dag_id']
-        adl       = args['adl']
-        workdir   = args['workdir']
-        config    = args['config_json']
-        datalake  = Datalake(adl, dag_id)
-        info      = ExtractInfos(datalake, workdir, config)
-        domain    = TransformDomains(datalake, workdir)
-
-        df_silver_infos = info.get_all_infos_from_silver(number_partitions)
-        df_silver_times = domain.get_times_from_silver()
+        dag_id        = args['dag_id']
+        adl           = args['adl']
+        workdir       = args['workdir']
+        config        = args['config_json']
+        model_changed = args['ti'].xcom_pull(key="model_changed")
+        datalake      = Datalake(adl, dag_id)
+        info          = ExtractInfos(datalake, workdir, config)
+        domain        = TransformDomains(datalake, workdir)
+        columns       = ['DATE', 'PERIOD', 'seg_id', 'INFO']
+
+        # Finish the gold swap of a run that failed after recording its consumed deltas
+        Infos.commit_gold_infos(datalake, info)
 
-        df_silver_infos['period']  = df_silver_infos['PERIOD']
-        df_silver_infos['weekday'] = df_silver_infos.apply( lambda row: domain.days_of_week[row['DATE'].weekday()], axis = 1)
-        df_silver_infos['day']     = df_silver_infos.apply( lambda row: row['DATE'].day, axis = 1)
-        df_silver_infos['month']   = df_silver_infos.apply( lambda row: row['DATE'].month, axis = 1)
-        df_silver_infos['year']    = df_silver_infos.apply( lambda row: row['DATE'].year, axis = 1)
-
-        df_infos = df_silver_infos.merge(df_silver_times, on=['period', 'weekday', 'day', 'month', 'year'])
-        df_infos = df_infos.drop(['period', 'weekday', 'day', 'month', 'year'], axis=1)
-
-        df_infos = df_infos.groupby(['time_id', 'seg_id', 'INFO'])['INFO'].count().reset_index(name="count")
-        df_infos = pd.pivot_table(df_infos, values='count', index=['time_id', 'seg_id'],columns=['INFO'], fill_value=0).reset_index()
-        
-        datalake.write_parquet_file_from_dataframe(info.gold_info_file_path, df_infos)
+        df_silver_times = domain.get_times_from_silver()
+        df_gold_infos   = info.get_infos_from_gold()
+        # The new rows written from now on by the partition tasks go to new delta files
+        consumed_files  = info.consume_infos_deltas_from_silver()
+
+        if model_changed != False or df_gold_infos.empty:
+            # Full rebuild from every silver partition
+            print("Aggregating every silver info into gold")
+            df_infos = Infos.aggregate_infos(domain, df_silver_times, info.get_all_infos_from_silver(columns=columns))
+        else:
+            # Only the rows added to silver since the last run are added to gold
+            df_silver_deltas = info.get_infos_consumed_from_silver(consumed_files, columns=columns)
+            print(f"Adding [{len(df_silver_deltas.index)}] new silver infos into gold")
+            df_infos = None
+            if not df_silver_deltas.empty:
+                df_infos = Infos.merge_add_infos(df_gold_infos, Infos.aggregate_infos(domain, df_silver_times, df_silver_deltas))
+
+        # The new gold is written aside, then the consumed deltas are recorded: from there the swap is completed
+        # even if this run fails, and the deltas are never added to gold twice
+        if df_infos is not None:
+            datalake.write_parquet_file_from_dataframe(info.gold_info_pending_file_path, df_infos)
+        datalake.write_json_file(info.silver_consumed_deltas, {'consumed': consumed_files, 'gold': df_infos is not None})
+        Infos.commit_gold_infos(datalake, info)
+
+    def commit_gold_infos(datalake, info):
+        if not datalake.verify_file_exists(info.silver_consumed_deltas):
+            # Nothing recorded: a pending gold is from a run that failed before, its deltas are applied again
+            if datalake.verify_file_exists(info.gold_info_pending_file_path):
+                datalake.remove_file(info.gold_info_pending_file_path)
+            return
+        commit = datalake.read_json_file(info.silver_consumed_deltas)
+        if commit['gold'] and datalake.verify_file_exists(info.gold_info_pending_file_path):
+            datalake.move_and_overwrite_file_from_to(info.gold_info_pending_file_path, info.gold_info_file_path)
+        for filename in commit['consumed']:
+            if datalake.verify_file_exists(filename):
+                datalake.remove_file(filename)
+        datalake.remove_file(info.silver_consumed_deltas)
+
+    def aggregate_infos(domain, df_silver_times, df_silver_infos):
+        # time_id by lookup of the integer time key (yyyymmdd and period code)
+        df_silver_infos['time_id'] = domain.get_time_ids(df_silver_times, df_silver_infos['PERIOD'], df_silver_infos['DATE'])
+        df_infos = df_silver_infos[df_silver_infos['time_id'] >= 0]
+
+        df_infos = df_infos.groupby(['time_id', 'seg_id', 'INFO'], observed=True)['INFO'].count().reset_index(name="count")
+        df_infos = pd.pivot_table(df_infos, values='count', index=['time_id', 'seg_id'],columns=['INFO'], fill_value=0, observed=True).reset_index()
+        info_columns = [c for c in df_infos.columns if c not in ['time_id', 'seg_id']]
+        df_infos[info_columns] = df_infos[info_columns].astype('int64')
+        return df_infos
+
+    def merge_add_infos(df_gold_infos, df_delta_infos):
+        # counts of the same (time_id, seg_id) are added, an info missing on one side counts zero
+        info_columns = list(dict.fromkeys([c for c in list(df_gold_infos.columns) + list(df_delta_infos.columns) if c not in ['time_id', 'seg_id']]))
+        df_infos = pd.concat([df_gold_infos, df_delta_infos], ignore_index=True)
+        df_infos[info_columns] = df_infos[info_columns].fillna(0).astype('int64')
+        return df_infos.groupby(['time_id', 'seg_id'], as_index=False)[info_columns].sum()
 
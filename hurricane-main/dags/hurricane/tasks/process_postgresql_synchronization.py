@@ -71,13 +71,15 @@ class SyncPostgreSQL:
         if tablename == "vertice":
             alter_table = f"alter table {schema}.{tablename} drop column if exists vertice"
             sync.execute_sql(alter_table)
-            alter_table = f"alter table {schema}.{tablename} add column vertice text not null"
-            sync.execute_sql(alter_table)
+            for c in ["lon", "lat"]:
+                alter_table = f"alter table {schema}.{tablename} add column if not exists {c} double precision not null"
+                sync.execute_sql(alter_table)
         elif tablename == "segment":
+            dataframe = dataframe.drop(columns=['lon_star', 'lat_star', 'lon_final', 'lat_final'], errors='ignore')
             dataframe['name']    = dataframe['name'].apply(lambda name : "{" + ",".join(name) + "}")
             dataframe['highway'] = dataframe['highway'].apply(lambda highway : "{" + ",".join(highway) + "}")
         elif tablename == "time":
-            pass
+            dataframe = dataframe.drop(columns=['period_code', 'time_key'], errors='ignore')
         else:
             for c in dataframe.columns: dataframe[c] = dataframe[c].astype(int)
         
@@ -87,8 +89,9 @@ class SyncPostgreSQL:
 
         if tablename == "vertice":
             sync.execute_sql("ALTER TABLE vertice add column geom geometry(point, 4326)")
-            sync.execute_sql("UPDATE vertice SET geom = st_setsrid(st_makepoint(split_part(vertice, ',',1) ::double precision, split_part(vertice, ',',2)::double precision),4326)")
-            sync.execute_sql("ALTER TABLE vertice drop column vertice")
+            sync.execute_sql("UPDATE vertice SET geom = st_setsrid(st_makepoint(lon, lat),4326)")
+            sync.execute_sql("ALTER TABLE vertice drop column lon")
+            sync.execute_sql("ALTER TABLE vertice drop column lat")
             sync.execute_sql("ALTER TABLE vertice rename column geom to vertice")
         
         datalake.remove_file(csv_file_path)
\ No newline at end of file
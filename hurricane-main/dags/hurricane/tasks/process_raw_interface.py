@@ -1,8 +1,10 @@
 import pandas as pd
 
+from functools import partial
 from hurricane.utils.datalake import Datalake
 from hurricane.data.extract.interfaces import Interface as ExtractInterface
 from hurricane.data.transform.interfaces import Interface as TransformInterface
+from hurricane.utils.geo import DEFAULT_CELL_SIZE
 
 class Interface:
     def process_raw_interface(**args):
@@ -15,19 +17,48 @@ class Interface:
         extract     = ExtractInterface(datalake, workdir, name)
         transform   = TransformInterface(datalake, workdir, name, config)
 
-        df_raw, raw_files = extract.from_raw()
-
-        if not df_raw.empty:
-            df_bronze = extract.from_bronze()
-            df_interface = transform.process(df_raw, dag_id)
-            new_df_bronze = pd.concat([df_bronze, df_interface]).drop_duplicates(
-                subset=['KEY'],
-                ignore_index=True,
-                keep='last'
-            ).reset_index(drop=True)
-            datalake.write_parquet_file_from_dataframe(extract.bronze_file_path, new_df_bronze)
-        
+        chunksize   = config.get('chunk_size', 100000)
+        max_workers = config.get('max_workers', 1)
+        worker_type = config.get('worker_type', 'thread')
+        partitions  = config.get('bronze_partitions', 16)
+        cell_size   = args.get('cell_size', DEFAULT_CELL_SIZE)
+
+        raw_files = extract.list_raw_files()
+
+        Interface.update_bronze_cells(extract, transform, cell_size, partitions)
+
+        if raw_files:
+            # Stream each raw file chunk by chunk into its own staging file, several files at a time
+            stage_file    = partial(Interface.stage_raw_file, extract, transform, dag_id, chunksize, cell_size)
+            staging_files = datalake.map_files(stage_file, list(enumerate(raw_files)), max_workers, worker_type)
+            staging_files = [f for f in staging_files if f is not None]
+            # Upsert the staging files into the bronze dataset by KEY, in the order of the raw files
+            if staging_files:
+                inserted, updated = datalake.upsert_parquet_dataset_by_key(extract.bronze_file_path, staging_files, 'KEY', partitions, {'cell_size': cell_size})
+                print(f'[{inserted}] rows inserted and [{updated}] rows updated in [{extract.bronze_file_path}]')
+
         # Backup raw files
         for file in raw_files:
             print(f'Move the raw file [{file}] to historic directory [{extract.historic_path}]')
-            datalake.move_file_to_historic(file, extract.historic_path, suffix = "", append_date=True)
\ No newline at end of file
+            datalake.move_file_to_historic(file, extract.historic_path, suffix = "", append_date=True)
+
+    def update_bronze_cells(extract, transform, cell_size, partitions):
+        # Bronze written before the spatial cells (or with another cell size) gets its CELL column (re)computed
+        datalake = extract.datalake
+        # Converts a legacy bronze file, and completes a conversion or an upsert interrupted by a failed run
+        datalake.upsert_parquet_dataset_by_key(extract.bronze_file_path, [], 'KEY', partitions)
+        if not datalake.verify_file_exists(extract.bronze_file_path):
+            return
+        if datalake.read_parquet_dataset_manifest(extract.bronze_file_path).get('cell_size') != cell_size:
+            print(f'Compute the spatial cells of [{extract.bronze_file_path}] with cell size [{cell_size}]')
+            add_cell = lambda df: df.assign(CELL = transform.create_cell(df, cell_size))
+            datalake.update_parquet_dataset(extract.bronze_file_path, add_cell, {'cell_size': cell_size})
+
+    def stage_raw_file(extract, transform, dag_id, chunksize, cell_size, raw_file):
+        index, file = raw_file
+        staging_file_path = extract.get_staging_file_path(index)
+        dtype     = extract.datalake.files_schema.get_read_dtypes(transform.config)
+        df_chunks = (transform.process(df_raw, dag_id, cell_size) for df_raw in extract.from_raw_in_chunks([file], chunksize, dtype))
+        rows = extract.datalake.write_parquet_file_from_chunks(staging_file_path, (df for df in df_chunks if not df.empty))
+        print(f'[{rows}] rows of [{file}] staged in [{staging_file_path}]')
+        return staging_file_path if rows > 0 else None
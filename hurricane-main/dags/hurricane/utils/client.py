@@ -5,6 +5,9 @@ class Client:
     def exists(self, filename):
         return os.path.exists(filename)
 
+    def isfile(self, filename):
+        return os.path.isfile(filename)
+
     def ls(self, path):
         return [os.path.join(path, f) for f in os.listdir(path)]
     
@@ -14,6 +17,10 @@ class Client:
     def mv(self, source, target):
         os.rename(source, target)
 
+    def info(self, filename):
+        stat = os.stat(filename)
+        return {'size': stat.st_size, 'modificationTime': stat.st_mtime * 1000}
+
     def open(self, filename, mode='rb'):
         return open(filename, mode)
 
@@ -1,16 +1,27 @@
 import chardet
+import codecs
+import csv
 import io
+import json
 import openpyxl
 import os
 import pathlib
+import pickle
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 from pyxlsb import open_workbook as open_xlsb
 from hurricane.schemas.files_schema import FilesSchema
 from hurricane.utils.client import Client
 
 class Datalake:
+    # encoding detected by (file path, size, modification time)
+    _encoding_cache = {}
+
     def __init__(self, config_dir, dag_id):
         self.config_dir   = config_dir
         self.dag_id       = dag_id
@@ -39,6 +50,9 @@ class Datalake:
         try:
             if not self.client.exists(path):
                 self.client.mkdir(path)
+        except FileExistsError:
+            # created meanwhile by a concurrent worker
+            pass
         except FileNotFoundError as e:
             raise FileNotFoundError(f'Failed to generate directory [{e}]')
     
@@ -146,6 +160,340 @@ class Datalake:
         except Exception:
             raise RuntimeError(f'Failed to write file [{file_path}] in datalake')
 
+    def write_parquet_file_from_chunks(self, file_path, chunks):
+        """
+        Write an iterable of pandas dataframes into a single parquet file, one row group per chunk,
+        so only one chunk is held in memory at a time.
+        Ps.: The file schema is defined by the first chunk, the next ones are converted to it.
+             Categorical columns are written with int32 dictionary indices, whatever the number
+             of categories of the first chunk.
+        Parameters
+        ----------
+        file_path: string
+            - Path to save the parquet file.
+
+        chunks: iterable
+            - Dataframes to write.
+
+        Return
+        ------
+        int
+            - Number of rows written (0 when there is no chunk, and no file is created).
+        """
+        self._create_path_if_not_exists(file_path)
+        parquet_file = None
+        writer       = None
+        rows         = 0
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    schema       = self._normalize_dictionary_schema(pa.Schema.from_pandas(chunk, preserve_index=False))
+                    table        = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                    parquet_file = self.client.open(file_path, 'wb')
+                    writer       = pq.ParquetWriter(parquet_file, table.schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+                rows += table.num_rows
+        except Exception as e:
+            raise RuntimeError(f'Failed to write file [{file_path}] in datalake [{e}]')
+        finally:
+            if writer is not None:
+                writer.close()
+            if parquet_file is not None:
+                parquet_file.close()
+        return rows
+
+    @staticmethod
+    def _normalize_dictionary_schema(schema):
+        # pandas picks the smallest index type that fits the categories of the dataframe (int8 under 128)
+        fields = [field.with_type(pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered))
+                  if pa.types.is_dictionary(field.type) else field for field in schema]
+        return pa.schema(fields, metadata=schema.metadata)
+
+    def read_parquet_file_in_batches(self, file_path, columns=None):
+        """
+        Read a parquet file in data lake one row group at a time.
+        Parameters
+        ----------
+        file_path: string
+            - Path to read the parquet file.
+
+        columns: list
+            - Columns to read, all of them by default.
+
+        Return
+        ------
+        generator
+            - Pandas dataframe of each row group.
+        """
+        if not self._file_path_validate(file_path, '.parquet'):
+            raise ValueError(f'This File [{file_path}] does not contain a correct extension')
+
+        try:
+            with self.client.open(file_path, 'rb') as parquet_file:
+                reader = pq.ParquetFile(parquet_file)
+                for row_group in range(reader.num_row_groups):
+                    yield reader.read_row_group(row_group, columns=columns).to_pandas()
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+
+    def upsert_parquet_dataset_by_key(self, dataset_path, staging_file_paths, key, partitions=16, properties=None):
+        """
+        Upsert the rows of staging parquet files into a parquet dataset partitioned by the hash of the key.
+        The dataset keeps an index (_index.npz) with the hash of every stored key and row, used to classify
+        the staging rows as inserts, updates or unchanged rows. Only the partitions with inserted or
+        updated rows are rewritten. Among repeated keys in the staging files the last one wins.
+        The staging files are removed at the end.
+        Ps.: A legacy single parquet file in dataset_path is converted into the partitioned dataset.
+             The new parts, index and manifest replace the current ones only once all of them are written,
+             so a failed run leaves the dataset as it was (or is completed by the next run) and can be retried.
+        Parameters
+        ----------
+        dataset_path: string
+            - Path of the dataset directory (created if it does not exist).
+
+        staging_file_paths: list
+            - Paths of the parquet files with the new rows, in order.
+
+        key: string
+            - Key column.
+
+        partitions: int
+            - Number of partitions of a new dataset (an existing dataset keeps its own).
+
+        properties: dict
+            - Extra fields saved in the manifest.
+
+        Return
+        ------
+        tuple(int, int)
+            - Number of inserted and updated rows.
+        """
+        staging_file_paths = list(staging_file_paths)
+        legacy_file_path   = dataset_path.replace('.parquet', '.legacy.parquet')
+        if self.client.exists(dataset_path) and self.client.isfile(dataset_path):
+            self.move_and_overwrite_file_from_to(dataset_path, legacy_file_path)
+        # a legacy file left by a failed run is still the only copy of the old rows
+        if self.client.exists(legacy_file_path):
+            staging_file_paths.insert(0, legacy_file_path)
+
+        self._recover_parquet_dataset(dataset_path)
+        manifest   = self.read_parquet_dataset_manifest(dataset_path)
+        partitions = manifest.get('partitions', partitions)
+        index_path = f'{dataset_path}/_index.npz'
+        if self.client.exists(index_path):
+            index = self.read_npz_file(index_path)
+            index_keys, index_rows = index['keys'], index['rows']
+        else:
+            index_keys, index_rows = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+        if len(index_keys) != manifest['rows']:
+            # the index does not describe the parts (written by another version), it is rebuilt from them
+            print(f'Rebuild the key index of [{dataset_path}]')
+            index_keys, index_rows = self._build_parquet_dataset_index(dataset_path, manifest, key)
+
+        # hash of the key and of the whole row of every staging row
+        key_hashes, row_hashes = [], []
+        for staging_file_path in staging_file_paths:
+            for df in self.read_parquet_file_in_batches(staging_file_path):
+                key_hashes.append(self._hash_rows(df, [key]))
+                row_hashes.append(self._hash_rows(df))
+        key_hashes = np.concatenate(key_hashes) if key_hashes else np.zeros(0, dtype=np.uint64)
+        row_hashes = np.concatenate(row_hashes) if row_hashes else np.zeros(0, dtype=np.uint64)
+
+        # last occurrence of each staging key
+        reverse_keys, last = np.unique(key_hashes[::-1], return_index=True)
+        last        = len(key_hashes) - 1 - last
+        position    = np.searchsorted(index_keys, reverse_keys)
+        found       = position < len(index_keys)
+        found[found] = index_keys[position[found]] == reverse_keys[found]
+        changed     = ~found
+        changed[found] = index_rows[position[found]] != row_hashes[last[found]]
+        is_update   = found & changed
+
+        write_mask  = np.zeros(len(key_hashes), dtype=bool)
+        write_mask[last[changed]] = True
+        updated_keys = reverse_keys[is_update]
+        partition_of = key_hashes % np.uint64(partitions)
+        touched      = np.unique(partition_of[write_mask])
+
+        # one pass over the staging files routes the written rows to a file by partition (.route.parquet)
+        route_paths = {int(partition): f'{dataset_path}/part-{int(partition):05d}.route.parquet' for partition in touched}
+        self._route_parquet_rows(staging_file_paths, np.where(write_mask, partition_of.astype(np.int64), -1), route_paths)
+
+        # the touched partitions are written next to the current parts (.merge), nothing is replaced yet
+        for partition, route_path in route_paths.items():
+            part_name = f'part-{partition:05d}.parquet'
+            part_path = f'{dataset_path}/{part_name}'
+            merge_path = f'{dataset_path}/{part_name}.merge'
+
+            def partition_chunks():
+                if self.client.exists(part_path):
+                    for df in self.read_parquet_file_in_batches(part_path):
+                        df = df[~np.isin(self._hash_rows(df, [key]), updated_keys)]
+                        if not df.empty:
+                            yield df
+                yield from self.read_parquet_file_in_batches(route_path)
+
+            rows = self.write_parquet_file_from_chunks(merge_path, partition_chunks())
+            self.remove_file(route_path)
+            manifest['parts'] = [p for p in manifest['parts'] if p['file'] != part_name] + [{'file': part_name, 'rows': rows}]
+
+        # update the index
+        index_rows = index_rows.copy()
+        index_rows[position[is_update]] = row_hashes[last[is_update]]
+        inserted   = changed & ~found
+        index_keys = np.concatenate([index_keys, reverse_keys[inserted]])
+        index_rows = np.concatenate([index_rows, row_hashes[last[inserted]]])
+        order      = np.argsort(index_keys, kind='stable')
+        if len(touched):
+            manifest['parts']      = sorted(manifest['parts'], key=lambda p: p['file'])
+            manifest['rows']       = sum(p['rows'] for p in manifest['parts'])
+            manifest['partitions'] = partitions
+            manifest['key']        = key
+            manifest.update(properties or {})
+            # the pending manifest is written last: once it exists the new parts, index and manifest replace the
+            # current ones, and a run that fails meanwhile is completed by the next one (_recover_parquet_dataset)
+            self.write_npz_file(f'{dataset_path}/_index.pending.npz', {'keys': index_keys[order], 'rows': index_rows[order]})
+            self.write_json_file(f'{dataset_path}/_manifest.pending.json', manifest)
+            self._recover_parquet_dataset(dataset_path)
+
+        for staging_file_path in staging_file_paths:
+            self.remove_file(staging_file_path)
+        return int(inserted.sum()), int(is_update.sum())
+
+    def _route_parquet_rows(self, file_paths, targets, route_paths):
+        """
+        Write each row of the parquet files to the route file of its target, in one pass over the files.
+        Rows with a target missing in route_paths (e.g. -1) are skipped.
+        Ps.: As in write_parquet_file_from_chunks, the schema of a route file is defined by its first chunk.
+        """
+        writers = {}
+        try:
+            start = 0
+            for file_path in file_paths:
+                for df in self.read_parquet_file_in_batches(file_path):
+                    stop  = start + len(df.index)
+                    chunk = targets[start:stop]
+                    start = stop
+                    for target in np.unique(chunk):
+                        if int(target) not in route_paths:
+                            continue
+                        if target not in writers:
+                            schema       = self._normalize_dictionary_schema(pa.Schema.from_pandas(df, preserve_index=False))
+                            self._create_path_if_not_exists(route_paths[int(target)])
+                            parquet_file = self.client.open(route_paths[int(target)], 'wb')
+                            writers[target] = (parquet_file, pq.ParquetWriter(parquet_file, schema))
+                        writer = writers[target][1]
+                        writer.write_table(pa.Table.from_pandas(df[chunk == target], schema=writer.schema, preserve_index=False))
+        except Exception as e:
+            raise RuntimeError(f'Failed to route the rows of [{file_paths}] [{e}]')
+        finally:
+            for parquet_file, writer in writers.values():
+                writer.close()
+                parquet_file.close()
+
+    def _recover_parquet_dataset(self, dataset_path):
+        """
+        Bring a parquet dataset back to a consistent state after an interrupted write.
+        With a pending manifest the pending parts, index and manifest replace the current ones,
+        otherwise the files of the unfinished write are removed.
+        """
+        if not self.client.exists(dataset_path) or self.client.isfile(dataset_path):
+            return
+        pending_manifest_path = f'{dataset_path}/_manifest.pending.json'
+        if self.client.exists(pending_manifest_path):
+            for part in self.read_json_file(pending_manifest_path)['parts']:
+                merge_path = f'{dataset_path}/{part["file"]}.merge'
+                if self.client.exists(merge_path):
+                    self.move_and_overwrite_file_from_to(merge_path, f'{dataset_path}/{part["file"]}')
+            if self.client.exists(f'{dataset_path}/_index.pending.npz'):
+                self.move_and_overwrite_file_from_to(f'{dataset_path}/_index.pending.npz', f'{dataset_path}/_index.npz')
+            self.move_and_overwrite_file_from_to(pending_manifest_path, f'{dataset_path}/_manifest.json')
+        for file_path in self.list_dir(dataset_path):
+            if file_path.endswith('.merge') or file_path.endswith('.route.parquet') or file_path.endswith('.pending.npz'):
+                self.remove_file(file_path)
+
+    def _build_parquet_dataset_index(self, dataset_path, manifest, key):
+        index_keys, index_rows = [np.zeros(0, dtype=np.uint64)], [np.zeros(0, dtype=np.uint64)]
+        for part in manifest['parts']:
+            for df in self.read_parquet_file_in_batches(f'{dataset_path}/{part["file"]}'):
+                index_keys.append(self._hash_rows(df, [key]))
+                index_rows.append(self._hash_rows(df))
+        index_keys = np.concatenate(index_keys)
+        index_rows = np.concatenate(index_rows)
+        order      = np.argsort(index_keys, kind='stable')
+        return index_keys[order], index_rows[order]
+
+    def update_parquet_dataset(self, dataset_path, function, properties=None):
+        """
+        Rewrite every part of a parquet dataset in data lake with a function, one part at a time,
+        and rebuild the key index of the dataset (if it has one).
+        Parameters
+        ----------
+        dataset_path: string
+            - Path of the dataset directory.
+
+        function: callable
+            - Receives and returns the pandas dataframe of a part.
+
+        properties: dict
+            - Extra fields saved in the manifest.
+        """
+        manifest = self.read_parquet_dataset_manifest(dataset_path)
+        key      = manifest.get('key')
+        index_keys, index_rows = [], []
+        for part in manifest['parts']:
+            part_path  = f'{dataset_path}/{part["file"]}'
+            merge_path = f'{part_path}.merge'
+            df = function(self.read_parquet_file(part_path))
+            if key is not None:
+                index_keys.append(self._hash_rows(df, [key]))
+                index_rows.append(self._hash_rows(df))
+            self.write_parquet_file_from_chunks(merge_path, [df])
+            self.move_and_overwrite_file_from_to(merge_path, part_path)
+
+        if index_keys:
+            index_keys = np.concatenate(index_keys)
+            index_rows = np.concatenate(index_rows)
+            order      = np.argsort(index_keys, kind='stable')
+            self.write_npz_file(f'{dataset_path}/_index.npz', {'keys': index_keys[order], 'rows': index_rows[order]})
+        manifest.update(properties or {})
+        self.write_json_file(f'{dataset_path}/_manifest.json', manifest)
+
+    def map_files(self, function, files, max_workers=1, worker_type='thread'):
+        """
+        Apply a function to each file with a pool of workers. Files are independent, so they are
+        processed concurrently, but the results keep the order of the files.
+        Parameters
+        ----------
+        function: callable
+            - Function applied to each file (must be picklable when worker_type is 'process').
+
+        files: list
+            - Files to process.
+
+        max_workers: int
+            - Number of files processed at the same time.
+
+        worker_type: string
+            - 'thread' or 'process'.
+
+        Return
+        ------
+        list
+            - Result of each file, in the order of the files.
+        """
+        if max_workers is None or max_workers <= 1 or len(files) <= 1:
+            return [function(file) for file in files]
+
+        if worker_type not in ['thread', 'process']:
+            raise ValueError(f'Worker type [{worker_type}] is not valid, use thread or process')
+
+        executor_class = ProcessPoolExecutor if worker_type == 'process' else ThreadPoolExecutor
+        with executor_class(max_workers=min(max_workers, len(files))) as executor:
+            return list(executor.map(function, files))
+
     def write_csv_file_from_dataframe(self, file_path, dataframe):
         """
         Transform a pandas dataframe into a CSV file and save in data lake.
@@ -242,13 +590,22 @@ class Datalake:
         except Exception:
             raise RuntimeError(f'Failed to generate file [{file_path}] in datalake')
 
-    def read_parquet_file(self, file_path):
+    def read_parquet_file(self, file_path, columns=None, filters=None, dtype_backend=None):
         """
         Transform a parquet file in data lake into a pandas dataframe.
         Parameter
         ---------
         file_path: string
             - Path to read the parquet file.
+
+        columns: list
+            - Columns to read, all of them by default.
+
+        filters: list
+            - Pyarrow filters (e.g. [('CELL', '>=', 10), ('CELL', '<', 20)]), pushed down to the row groups.
+
+        dtype_backend: string
+            - 'pyarrow' to return Arrow-backed columns, numpy-backed by default.
         
         Return
         ------
@@ -260,8 +617,191 @@ class Datalake:
 
         try:
             with self.client.open(file_path, 'rb') as parquet_file:
-                file = pd.read_parquet(parquet_file)
-                return file
+                table = pq.read_table(parquet_file, columns=columns, filters=filters)
+                return self._table_to_dataframe(table, dtype_backend)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+
+    @staticmethod
+    def _table_to_dataframe(table, dtype_backend=None):
+        if dtype_backend == 'pyarrow':
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        return table.to_pandas()
+
+    def write_json_file(self, file_path, content):
+        """
+        Save a json serializable content into a json file in data lake.
+        Parameters
+        ----------
+        file_path: string
+            - Path to save the json file.
+
+        content: object
+            - Content to save.
+        """
+        self._create_path_if_not_exists(file_path)
+        try:
+            with self.client.open(file_path, 'wb') as json_file:
+                json_file.write(json.dumps(content).encode('utf-8'))
+        except Exception:
+            raise RuntimeError(f'Failed to write file [{file_path}] in datalake')
+
+    def read_json_file(self, file_path):
+        """
+        Load a json file in data lake.
+        Parameter
+        ---------
+        file_path: string
+            - Path to read the json file.
+
+        Return
+        ------
+        object
+            - Content of the file.
+        """
+        if not self._file_path_validate(file_path, '.json'):
+            raise ValueError(f'This File [{file_path}] does not contain a correct extension')
+
+        try:
+            with self.client.open(file_path, 'rb') as json_file:
+                return json.loads(json_file.read().decode('utf-8'))
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+
+    def write_arrow_file(self, file_path, dataframe):
+        """
+        Save a pandas dataframe into an uncompressed Arrow IPC file in data lake, readable with memory mapping.
+        Parameters
+        ----------
+        file_path: string
+            - Path to save the arrow file.
+
+        dataframe: pandas.core.frame.DataFrame
+            - Dataframe to save.
+        """
+        self._create_path_if_not_exists(file_path)
+        try:
+            table = pa.Table.from_pandas(dataframe, preserve_index=False)
+            with self.client.open(file_path, 'wb') as arrow_file:
+                with pa.ipc.new_file(arrow_file, table.schema) as writer:
+                    writer.write_table(table)
+        except Exception as e:
+            raise RuntimeError(f'Failed to write file [{file_path}] in datalake [{e}]')
+
+    def read_arrow_file(self, file_path, memory_map=True):
+        """
+        Read an Arrow IPC file in data lake.
+        Parameters
+        ----------
+        file_path: string
+            - Path to read the arrow file.
+
+        memory_map: boolean
+            - Map the file in memory (zero copy, the data is only read when used).
+
+        Return
+        ------
+        pyarrow.Table
+            - Content of the file.
+        """
+        if not self._file_path_validate(file_path, '.arrow'):
+            raise ValueError(f'This File [{file_path}] does not contain a correct extension')
+
+        try:
+            if memory_map:
+                return pa.ipc.open_file(pa.memory_map(file_path, 'r')).read_all()
+            with self.client.open(file_path, 'rb') as arrow_file:
+                return pa.ipc.open_file(arrow_file).read_all()
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+
+    def write_pickle_file(self, file_path, content):
+        """
+        Serialize a python object (e.g. a spatial index) into a pickle file and save in data lake.
+        Parameters
+        ----------
+        file_path: string
+            - Path to save the pickle file.
+
+        content: object
+            - Object to serialize.
+        """
+        self._create_path_if_not_exists(file_path)
+        try:
+            buffer = pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            raise RuntimeError(f'Failed to generate pickle file.')
+        try:
+            with self.client.open(file_path, 'wb') as pickle_file:
+                pickle_file.write(buffer)
+        except Exception:
+            raise RuntimeError(f'Failed to write file [{file_path}] in datalake')
+
+    def read_pickle_file(self, file_path):
+        """
+        Load a python object from a pickle file in data lake.
+        Parameter
+        ---------
+        file_path: string
+            - Path to read the pickle file.
+
+        Return
+        ------
+        object
+            - Deserialized object.
+        """
+        if not self._file_path_validate(file_path, '.pickle'):
+            raise ValueError(f'This File [{file_path}] does not contain a correct extension')
+
+        try:
+            with self.client.open(file_path, 'rb') as pickle_file:
+                return pickle.load(pickle_file)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+
+    def write_npz_file(self, file_path, arrays):
+        """
+        Save a dictionary of numpy arrays into a npz file in data lake.
+        Parameters
+        ----------
+        file_path: string
+            - Path to save the npz file.
+
+        arrays: dict
+            - Arrays by name.
+        """
+        self._create_path_if_not_exists(file_path)
+        buffer = io.BytesIO()
+        try:
+            np.savez(buffer, **arrays)
+        except Exception:
+            raise RuntimeError(f'Failed to generate npz file.')
+        try:
+            with self.client.open(file_path, 'wb') as npz_file:
+                npz_file.write(buffer.getbuffer())
+        except Exception:
+            raise RuntimeError(f'Failed to write file [{file_path}] in datalake')
+
+    def read_npz_file(self, file_path):
+        """
+        Load a npz file in data lake into a dictionary of numpy arrays.
+        Parameter
+        ---------
+        file_path: string
+            - Path to read the npz file.
+
+        Return
+        ------
+        dict
+            - Arrays by name.
+        """
+        if not self._file_path_validate(file_path, '.npz'):
+            raise ValueError(f'This File [{file_path}] does not contain a correct extension')
+
+        try:
+            with self.client.open(file_path, 'rb') as npz_file:
+                with np.load(npz_file) as arrays:
+                    return {name: arrays[name] for name in arrays.files}
         except FileNotFoundError as e:
             raise FileNotFoundError(f'File [{e}] does not exists.')
 
@@ -376,7 +916,117 @@ class Datalake:
         except FileNotFoundError as e:
             raise FileNotFoundError(f'File [{e}] does not exists.')
 
-    def read_xlsb_file_on_dataframe(self, 
+    def read_csv_header_on_dataframe(self, file_path, sep=';', encoding=None, sample_rows=0):
+        """
+        Read only the header of a CSV file in data lake (and optionally its first rows as strings).
+        The encoding is taken from the BOM when the file has one, otherwise from the encoding parameter,
+        otherwise it is detected.
+        Parameters
+        ----------
+        file_path: string
+            - Path to read the CSV file.
+
+        sep: string
+            - CSV separator.
+
+        encoding: string
+            - Encoding used when the file has no BOM.
+
+        sample_rows: int
+            - Number of rows to read after the header.
+        Return
+        ------
+        file: pandas.core.frame.DataFrame
+            - Dataframe with the file columns and the sampled rows (empty when sample_rows is 0).
+        """
+        if not self._file_path_validate(file_path, '.csv'):
+            raise ValueError(f'This file {file_path} does not contain a correct extension')
+
+        try:
+            with self.client.open(file_path) as file:
+                file_encoding = self._get_encoding_by_bom(file.read(4)) or encoding or self.get_encoding(file_path)
+                file.seek(0)
+                if sample_rows:
+                    return pd.read_csv(file, sep=sep, encoding=file_encoding, dtype=str, header=0, nrows=sample_rows)
+                header = io.TextIOWrapper(file, encoding=file_encoding, newline='').readline()
+                columns = next(csv.reader([header.rstrip('\r\n')], delimiter=sep), [])
+                return pd.DataFrame(columns=columns)
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+
+    @staticmethod
+    def _get_encoding_by_bom(prefix):
+        """
+        Return the encoding given by the byte order mark of the file prefix, or None.
+        """
+        if prefix.startswith(codecs.BOM_UTF32_LE) or prefix.startswith(codecs.BOM_UTF32_BE):
+            return 'utf-32'
+        if prefix.startswith(codecs.BOM_UTF16_LE) or prefix.startswith(codecs.BOM_UTF16_BE):
+            return 'utf-16'
+        if prefix.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        return None
+
+    def read_csv_file_in_chunks(self,
+                                file_path,
+                                chunksize,
+                                sep=';',
+                                sep_decimal='.',
+                                sep_thousands=None,
+                                dtype=None,
+                                encoding=None,
+                                header=None):
+        """
+        Read a CSV file in data lake in chunks of rows with the C parser.
+        Parameters
+        ----------
+        file_path: string
+            - Path to read the CSV file.
+
+        chunksize: int
+            - Number of rows of each chunk.
+
+        sep: string
+            - CSV separator.
+
+        sep_decimal: string
+            - Decimal unit separator.
+
+        sep_thousands: string
+            - Thousand unit separator.
+
+        dtype: dict
+            - Data type of columns.
+
+        encoding: string
+            - Type of encoding.
+        Return
+        ------
+        generator
+            - Pandas dataframe of each chunk.
+        """
+        if not self._file_path_validate(file_path, '.csv'):
+            raise ValueError(f'This file {file_path} does not contain a correct extension')
+
+        file_encoding = self.get_encoding(file_path) if encoding is None else encoding
+        try:
+            with self.client.open(file_path) as file:
+                reader = pd.read_csv(
+                    file,
+                    sep=sep,
+                    decimal=sep_decimal,
+                    thousands=sep_thousands,
+                    encoding=file_encoding,
+                    dtype=dtype,
+                    engine='c',
+                    header=header,
+                    chunksize=chunksize)
+                for chunk in reader:
+                    yield chunk
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+
+    def read_xlsb_file_on_dataframe(self,
                                     file_path, 
                                     sheet_name=0,
                                     header=0,
@@ -519,36 +1169,153 @@ class Datalake:
         except Exception:
             raise FileNotFoundError(f'Failed to write file [{file_path}] in data lake.')
         
-    def append_parquet(self, df, save_path, schema=None):
+    def append_parquet(self, df, save_path, schema=None, key=None):
         """
-        Append dataframe content in data lake parquet file.
+        Append dataframe content in data lake parquet dataset.
+        The dataset is a directory with one parquet file per append, a manifest (_manifest.json) and
+        the hashes of the stored keys (_keys.npz), so each append only reads the key index and writes
+        the new rows, whatever the size of the dataset.
+        Ps.: A legacy single parquet file in save_path is converted into the first part of the dataset.
         Parameters
         ----------
         df: pandas.core.frame.DataFrame
             - Pandas dataframe.
         
         save_path: string
-            - Path to save content.
+            - Path of the dataset directory.
         
         schema: object
             - Parquet file schema.
+
+        key: list
+            - Columns identifying a row. Rows whose key is already stored are not appended.
+              By default the whole row is the key. It must be the same for every append of a dataset.
+
+        Return
+        ------
+        int
+            - Number of rows appended.
         """
-        buffer = io.BytesIO()
         try:
-            if self.client.exists(save_path):
-                adl_df = self.read_parquet_file(save_path)
-                adl_df = adl_df.append(df)
-                adl_df.drop_duplicates(inplace=True, ignore_index=True)
-                adl_df.to_parquet(buffer)
-            else:
-                df.to_parquet(buffer)
-            with self.client.open(save_path, 'wb') as parquet_file:
-                parquet_file.write(buffer.getbuffer())
+            if not self.client.exists(save_path) and self.client.exists(f'{save_path}.convert'):
+                # conversion interrupted after the legacy file was removed, its dataset is complete
+                self.client.mv(f'{save_path}.convert', save_path)
+            if self.client.exists(save_path) and self.client.isfile(save_path):
+                self._convert_parquet_file_to_dataset(save_path, key)
 
-                df = pd.read_parquet(buffer)
+            manifest = self.read_parquet_dataset_manifest(save_path)
+            hashes   = self._read_parquet_dataset_keys(save_path)
 
-        except Exception:
-            raise RuntimeError(f'File append failed [{save_path}]')
+            new_hashes = self._hash_rows(df, key)
+            # drop keys already stored and keys repeated in the new rows (keep the first one)
+            _, first   = np.unique(new_hashes, return_index=True)
+            is_new     = np.zeros(len(new_hashes), dtype=bool)
+            is_new[first] = True
+            is_new    &= ~np.isin(new_hashes, hashes)
+            df         = df[is_new]
+            if df.empty:
+                return 0
+
+            part_name = f'part-{len(manifest["parts"]):05d}.parquet'
+            schema    = schema if schema is not None else self._normalize_dictionary_schema(pa.Schema.from_pandas(df, preserve_index=False))
+            table     = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            self._create_path_if_not_exists(f'{save_path}/{part_name}')
+            with self.client.open(f'{save_path}/{part_name}', 'wb') as parquet_file:
+                pq.write_table(table, parquet_file)
+
+            self.write_npz_file(f'{save_path}/_keys.npz', {'hashes': np.union1d(hashes, new_hashes[is_new])})
+            manifest['parts'].append({'file': part_name, 'rows': table.num_rows})
+            manifest['rows'] += table.num_rows
+            self.write_json_file(f'{save_path}/_manifest.json', manifest)
+            return table.num_rows
+        except Exception as e:
+            raise RuntimeError(f'File append failed [{save_path}] [{e}]')
+
+    def _convert_parquet_file_to_dataset(self, file_path, key=None):
+        """
+        Replace a single parquet file by a dataset with the file content.
+        The dataset is built in a temporary directory, the file is removed only once the dataset is complete.
+        """
+        convert_path = f'{file_path}.convert'
+        if self.client.exists(convert_path):
+            self.client.remove(convert_path, recursive=True)
+        df = self.read_parquet_file(file_path)
+        self.client.mkdir(convert_path)
+        self.append_parquet(df, convert_path, key=key)
+        self.client.remove(file_path)
+        self.client.mv(convert_path, file_path)
+
+    def read_parquet_dataset_manifest(self, dataset_path):
+        """
+        Read the manifest of a parquet dataset in data lake.
+        Parameter
+        ---------
+        dataset_path: string
+            - Path of the dataset directory.
+
+        Return
+        ------
+        dict
+            - Parts of the dataset ({'file', 'rows'}) and its total of rows.
+        """
+        manifest_path = f'{dataset_path}/_manifest.json'
+        if not self.client.exists(manifest_path):
+            return {'parts': [], 'rows': 0}
+        return self.read_json_file(manifest_path)
+
+    def _read_parquet_dataset_keys(self, dataset_path):
+        keys_path = f'{dataset_path}/_keys.npz'
+        if not self.client.exists(keys_path):
+            return np.zeros(0, dtype=np.uint64)
+        return self.read_npz_file(keys_path)['hashes']
+
+    @staticmethod
+    def _hash_rows(df, key=None):
+        """
+        Return the 64 bits hash of the key columns of each row.
+        """
+        columns = df.columns if key is None else key
+        return pd.util.hash_pandas_object(df[list(columns)], index=False).to_numpy(dtype=np.uint64)
+
+    def read_parquet_dataset(self, dataset_path, columns=None, filters=None, dtype_backend=None):
+        """
+        Read all parts of a parquet dataset in data lake, in append order.
+        Parameters
+        ----------
+        dataset_path: string
+            - Path of the dataset directory.
+
+        columns: list
+            - Columns to read, all of them by default.
+
+        filters: list
+            - Pyarrow filters, pushed down to the row groups of every part.
+
+        dtype_backend: string
+            - 'pyarrow' to return Arrow-backed columns, numpy-backed by default.
+
+        Return
+        ------
+        pandas.core.frame.DataFrame
+            - Dataset content (empty when the dataset does not exist).
+        """
+        if self.client.exists(dataset_path) and self.client.isfile(dataset_path):
+            # legacy single file
+            return self.read_parquet_file(dataset_path, columns, filters, dtype_backend)
+
+        manifest = self.read_parquet_dataset_manifest(dataset_path)
+        parts    = []
+        try:
+            for part in manifest['parts']:
+                with self.client.open(f'{dataset_path}/{part["file"]}', 'rb') as parquet_file:
+                    table = pq.read_table(parquet_file, columns=columns, filters=filters)
+                    # parts written with another dictionary index type would not concatenate
+                    parts.append(table.cast(self._normalize_dictionary_schema(table.schema)))
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f'File [{e}] does not exists.')
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        return self._table_to_dataframe(pa.concat_tables(parts), dtype_backend)
 
     def backup_file(self, file_path, backup_file_path):
         """
@@ -595,25 +1362,45 @@ class Datalake:
             raise RuntimeError(f'Failed to filter directory [{directory}]')
         return files
 
-    def get_encoding(self, file_path):
+    def get_encoding(self, file_path, sample_size=1024 * 1024):
         """
         Return encoding of the file.
+        The BOM is checked first, otherwise the detection runs over a bounded prefix of the file
+        and stops as soon as the detector is confident. The result is cached by (path, size, modification time).
         Parameter
         ---------
         file_path: string
             - Data lake path of file.
+
+        sample_size: int
+            - Maximum number of bytes used by the detection.
         Return
         ------
         string
             - Encoding type of file.      
         """
-        file_encoding = 'utf-8'
         try:
+            info      = self.client.info(file_path)
+            cache_key = (file_path, info['size'], info['modificationTime'])
+            if cache_key in Datalake._encoding_cache:
+                return Datalake._encoding_cache[cache_key]
+
             with self.client.open(file_path) as file:
-                file_content = file.read()
-                file_detect = chardet.detect(file_content)
-                file_encoding = file_detect['encoding']
+                file_encoding = self._get_encoding_by_bom(file.read(4))
+                if file_encoding is None:
+                    file.seek(0)
+                    detector = chardet.UniversalDetector()
+                    read     = 0
+                    while read < sample_size and not detector.done:
+                        block = file.read(min(64 * 1024, sample_size - read))
+                        if not block:
+                            break
+                        detector.feed(block)
+                        read += len(block)
+                    detector.close()
+                    file_encoding = detector.result['encoding'] or 'utf-8'
 
+            Datalake._encoding_cache[cache_key] = file_encoding
             return file_encoding
         except FileNotFoundError as e:
             raise FileNotFoundError(f'Failed to detect file encoding [{e}]')
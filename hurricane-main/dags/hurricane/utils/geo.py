@@ -0,0 +1,266 @@
+import numpy as np
+import shapely
+
+from scipy.spatial import cKDTree
+from shapely import STRtree
+from shapely.geometry.base import BaseGeometry
+
+EARTH_RADIUS_KM   = 6371.0
+DEFAULT_CELL_SIZE = 0.01
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers between pairs of points.
+    All parameters are broadcastable arrays (or scalars) in degrees.
+    """
+    p   = np.pi / 180
+    hav = 0.5 - np.cos((lat2 - lat1) * p) / 2 + np.cos(lat1 * p) * np.cos(lat2 * p) * (1 - np.cos((lon2 - lon1) * p)) / 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0)))
+
+
+def haversine_one_to_many(lat, lon, lats, lons):
+    """
+    Distance in kilometers from one point to every point of (lats, lons).
+    """
+    return haversine(lat, lon, np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+
+
+def haversine_many_to_many(lats1, lons1, lats2, lons2, chunk_size=4096):
+    """
+    Distance matrix in kilometers (len(lats1) x len(lats2)).
+    Rows are computed in chunks so the temporaries stay bounded by chunk_size x len(lats2).
+    """
+    lats1, lons1 = np.asarray(lats1, dtype=float), np.asarray(lons1, dtype=float)
+    lats2, lons2 = np.asarray(lats2, dtype=float)[None, :], np.asarray(lons2, dtype=float)[None, :]
+    distances = np.empty((len(lats1), lats2.shape[1]))
+    for start in range(0, len(lats1), chunk_size):
+        stop = start + chunk_size
+        distances[start:stop] = haversine(lats1[start:stop, None], lons1[start:stop, None], lats2, lons2)
+    return distances
+
+
+class PolygonIndex:
+    """
+    Point-in-polygon association engine backed by a shapely STRtree.
+    Polygons must be given in priority order: when a point falls inside more
+    than one polygon, the id of the first one wins.
+    Parameters
+    ----------
+    geometries: list
+        - Polygons (shapely geometries) in priority order. Missing geometries are ignored.
+    ids: list
+        - Id of each polygon.
+    """
+    def __init__(self, geometries, ids):
+        self.geometries = np.array([g if isinstance(g, BaseGeometry) else None for g in geometries], dtype=object)
+        self.ids        = np.asarray(ids)
+        self.tree       = STRtree(self.geometries)
+
+    def associate(self, x, y, default=0):
+        """
+        Return, for every point, the id of the first polygon that contains it.
+        Parameters
+        ----------
+        x: numpy.ndarray
+            - Longitude of the points.
+        y: numpy.ndarray
+            - Latitude of the points.
+        default: int
+            - Id given to points outside every polygon.
+        Return
+        ------
+        numpy.ndarray
+            - Polygon id of each point.
+        """
+        points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        result = np.full(len(points), default, dtype=self.ids.dtype if len(self.ids) else int)
+        if len(self.ids) == 0:
+            return result
+
+        # pairs (point, polygon) where polygon.contains(point)
+        point_index, polygon_index = self.tree.query(points, predicate='within')
+        if len(point_index) == 0:
+            return result
+
+        # keep the highest priority polygon (lowest position) for each point
+        first = argmin_by_group(point_index, polygon_index)
+        result[point_index[first]] = self.ids[polygon_index[first]]
+        return result
+
+
+class NearestVertexIndex:
+    """
+    Nearest neighbour index over the model vertices.
+    Points are mapped onto the unit sphere, so the euclidean (chord) nearest
+    neighbour given by the cKDTree is also the great-circle nearest neighbour.
+    Parameters
+    ----------
+    ver_ids: list
+        - Id of each vertex.
+    lon: numpy.ndarray
+        - Longitude of each vertex.
+    lat: numpy.ndarray
+        - Latitude of each vertex.
+    """
+    def __init__(self, ver_ids, lon, lat):
+        self.ver_ids = np.asarray(ver_ids)
+        self.tree    = cKDTree(to_unit_sphere(lon, lat))
+
+    def __len__(self):
+        return len(self.ver_ids)
+
+    def query(self, lon, lat):
+        """
+        Return the closest vertex of every point in one batched query.
+        Parameters
+        ----------
+        lon: numpy.ndarray
+            - Longitude of the points.
+        lat: numpy.ndarray
+            - Latitude of the points.
+        Return
+        ------
+        tuple(numpy.ndarray, numpy.ndarray)
+            - Id of the closest vertex and its distance in kilometers.
+        """
+        chord, position = self.tree.query(to_unit_sphere(lon, lat))
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+        return self.ver_ids[position], distance
+
+
+class VertexAdjacency:
+    """
+    CSR adjacency of the road network: the segments incident to the vertex
+    ver_ids[i] are seg_ids[offsets[i]:offsets[i + 1]].
+    Parameters
+    ----------
+    ver_ids: numpy.ndarray
+        - Sorted ids of the vertices with at least one segment.
+    offsets: numpy.ndarray
+        - Start of the segments of each vertex (len(ver_ids) + 1 values).
+    seg_ids: numpy.ndarray
+        - Incident segment ids grouped by vertex.
+    """
+    def __init__(self, ver_ids, offsets, seg_ids):
+        self.ver_ids = np.asarray(ver_ids)
+        self.offsets = np.asarray(offsets)
+        self.seg_ids = np.asarray(seg_ids)
+
+    @classmethod
+    def from_segments(cls, seg_ids, ver_id_star, ver_id_final):
+        seg_ids  = np.asarray(seg_ids)
+        vertices = np.concatenate([np.asarray(ver_id_star), np.asarray(ver_id_final)])
+        segments = np.concatenate([seg_ids, seg_ids])
+        order    = np.argsort(vertices, kind='stable')
+        ver_ids, counts = np.unique(vertices[order], return_counts=True)
+        offsets  = np.concatenate([[0], np.cumsum(counts)])
+        return cls(ver_ids, offsets, segments[order])
+
+    def to_dict(self):
+        return {'ver_ids': self.ver_ids, 'offsets': self.offsets, 'seg_ids': self.seg_ids}
+
+    def incident(self, ver_ids):
+        """
+        Return the segments incident to each vertex, O(degree) per vertex.
+        Parameters
+        ----------
+        ver_ids: numpy.ndarray
+            - Vertex ids to look up.
+        Return
+        ------
+        tuple(numpy.ndarray, numpy.ndarray)
+            - Position of the looked up vertex and incident segment id of every pair.
+        """
+        ver_ids  = np.asarray(ver_ids)
+        if len(self.ver_ids) == 0:
+            return np.zeros(0, dtype=int), self.seg_ids[:0]
+        position = np.minimum(np.searchsorted(self.ver_ids, ver_ids), len(self.ver_ids) - 1)
+        found    = self.ver_ids[position] == ver_ids
+        start    = np.where(found, self.offsets[position], 0)
+        counts   = np.where(found, self.offsets[position + 1] - start, 0)
+        group    = np.repeat(np.arange(len(ver_ids)), counts)
+        index    = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(start, counts)
+        return group, self.seg_ids[index]
+
+
+def grid_cells(lon, lat, cell_size=DEFAULT_CELL_SIZE):
+    """
+    Spatial grid cell of every point, cells of cell_size degrees numbered in Z-order (Morton code),
+    so contiguous ranges of cells are spatially compact blocks.
+    """
+    col = np.floor((np.asarray(lon, dtype=float) + 180) / cell_size).astype(np.uint64)
+    row = np.floor((np.asarray(lat, dtype=float) + 90) / cell_size).astype(np.uint64)
+    return (_spread_bits(col) | (_spread_bits(row) << np.uint64(1))).astype(np.int64)
+
+
+def _spread_bits(values):
+    # insert a zero bit between each bit of the 32 lower bits
+    values = values & np.uint64(0xFFFFFFFF)
+    for shift, mask in [(16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)]:
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def to_unit_sphere(lon, lat):
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def project(lon, lat, lat0):
+    """
+    Equirectangular projection (in kilometers) around the latitude lat0.
+    Good enough to compare distances at city scale.
+    """
+    x = EARTH_RADIUS_KM * np.radians(lon) * np.cos(np.radians(lat0))
+    y = EARTH_RADIUS_KM * np.radians(lat)
+    return x, y
+
+
+def point_segment_distance(px, py, ax, ay, bx, by):
+    """
+    Distance between points P and segments AB, clamped to the segment ends.
+    All parameters are broadcastable float arrays of planar coordinates.
+    Degenerate segments (A == B) are measured as the distance to A.
+    """
+    dx, dy  = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = ((px - ax) * dx + (py - ay) * dy) / np.where(length2 > 0, length2, 1.0)
+    t = np.clip(np.where(length2 > 0, t, 0.0), 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def argmin_by_group(groups, values):
+    """
+    Return the positions of the smallest value of each group (ties keep the first position).
+    """
+    order = np.lexsort((values, groups))
+    first = np.r_[True, groups[order][1:] != groups[order][:-1]] if len(order) else np.zeros(0, dtype=bool)
+    return order[first]
+
+
+def nearest_segments(point_index, lon, lat, lon_star, lat_star, lon_final, lat_final):
+    """
+    Pick the nearest segment of each point among its candidate segments.
+    Parameters
+    ----------
+    point_index: numpy.ndarray
+        - Point each candidate belongs to.
+    lon, lat: numpy.ndarray
+        - Coordinates of the point of each candidate.
+    lon_star, lat_star, lon_final, lat_final: numpy.ndarray
+        - Coordinates of the ends of each candidate segment.
+    Return
+    ------
+    tuple(numpy.ndarray, numpy.ndarray)
+        - Position of the chosen candidate of each point (ordered by point) and its distance in kilometers.
+    """
+    px, py = project(lon, lat, lat)
+    ax, ay = project(lon_star, lat_star, lat)
+    bx, by = project(lon_final, lat_final, lat)
+    distance = point_segment_distance(px, py, ax, ay, bx, by)
+    nearest  = argmin_by_group(np.asarray(point_index), distance)
+    return nearest, distance[nearest]
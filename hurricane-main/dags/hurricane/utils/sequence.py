@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class IdSequence:
+    """
+    Contiguous id allocator. The high-water mark (last allocated id) of every sequence
+    is persisted in a json file in data lake, so incremental runs allocate new ids
+    without rescanning the table the ids belong to.
+    Parameters
+    ----------
+    datalake: Datalake
+        - Data lake where the high-water marks are kept.
+    file_path: string
+        - Path of the json file with the high-water marks.
+    name: string
+        - Name of the sequence (usually the id column).
+    """
+    def __init__(self, datalake, file_path, name):
+        self.datalake  = datalake
+        self.file_path = file_path
+        self.name      = name
+
+    def _read_marks(self):
+        if self.datalake.verify_file_exists(self.file_path):
+            return self.datalake.read_json_file(self.file_path)
+        return {}
+
+    def last_value(self):
+        """
+        Return the last allocated id, None when the sequence was never used.
+        """
+        return self._read_marks().get(self.name)
+
+    def reset(self, last_value=0):
+        marks = self._read_marks()
+        marks[self.name] = int(last_value)
+        self.datalake.write_json_file(self.file_path, marks)
+
+    def allocate(self, count):
+        """
+        Allocate count contiguous ids after the high-water mark and persist the new mark.
+        Return
+        ------
+        numpy.ndarray
+            - Allocated ids.
+        """
+        start = (self.last_value() or 0) + 1
+        ids   = np.arange(start, start + count, dtype='int64')
+        if count > 0:
+            self.reset(ids[-1])
+        return ids
+
+    @staticmethod
+    def assign_ids(dataframe, column_name_id, start_value=1, loc=None):
+        """
+        Return a copy of the dataframe with contiguous ids start_value, start_value + 1, ...
+        Parameters
+        ----------
+        dataframe: pandas.DataFrame
+            - Rows to number.
+        column_name_id: string
+            - Name of the id column.
+        start_value: int
+            - First id.
+        loc: int
+            - Position of the id column, the id is the last column when None.
+        """
+        df  = dataframe.reset_index(drop=True)
+        ids = np.arange(start_value, start_value + len(df.index), dtype='int64')
+        if loc is None:
+            return df.assign(**{column_name_id: ids})
+        df = df.drop(columns=[column_name_id], errors='ignore')
+        df.insert(loc, column_name_id, ids)
+        return df
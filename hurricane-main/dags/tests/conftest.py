@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# the dags directory holds the hurricane package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hurricane.utils.datalake import Datalake
+
+
+@pytest.fixture
+def datalake():
+    return Datalake(None, 'test')
@@ -0,0 +1,26 @@
+import importlib
+import os
+import shutil
+
+import pytest
+
+airflow = pytest.importorskip('airflow')
+
+
+def test_general_dag_imports_with_mapped_partition_tasks(tmp_path, monkeypatch):
+    from airflow.models import Variable
+    configs = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hurricane', 'configs')
+    for name in os.listdir(configs):
+        shutil.copy(os.path.join(configs, name), tmp_path)
+    monkeypatch.setattr(Variable, 'get', staticmethod(lambda key, *args, **kwargs: str(tmp_path)))
+
+    module = importlib.reload(importlib.import_module('hurricane.hurricane'))
+    dag    = module.__dict__['Hurricane-PMERJ-Crimes']
+
+    check     = dag.get_task('process_check_model_and_info')
+    partition = dag.get_task('process_crime_partition')
+    assert partition.upstream_task_ids == {check.task_id}
+    assert partition.downstream_task_ids == {'process_crime'}
+    # only the partition descriptor is mapped, the config is shared by every mapped task
+    assert set(partition.partial_kwargs['op_kwargs']) == {'dag_id', 'adl', 'workdir', 'config_json', 'related_config_json'}
+    assert 'op_args' in partition.expand_input.value
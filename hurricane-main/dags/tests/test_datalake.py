@@ -0,0 +1,314 @@
+import os
+
+import pandas as pd
+import pytest
+
+from hurricane.utils.datalake import Datalake
+
+
+def test_upsert_with_more_categories_than_the_first_staging_file(datalake, tmp_path):
+    # the first staging file has int8 dictionary indices, the second one needs int16
+    small = pd.DataFrame({'KEY': ['a', 'b'], 'C': pd.Categorical(['x', 'y'])})
+    large = pd.DataFrame({'KEY': [f'k{i}' for i in range(300)], 'C': pd.Categorical([f'c{i}' for i in range(300)])})
+    small.to_parquet(tmp_path / 's0.parquet', index=False)
+    large.to_parquet(tmp_path / 's1.parquet', index=False)
+
+    dataset = str(tmp_path / 'dataset.parquet')
+    inserted, updated = datalake.upsert_parquet_dataset_by_key(dataset, [str(tmp_path / 's0.parquet'), str(tmp_path / 's1.parquet')], 'KEY', partitions=2)
+
+    result = datalake.read_parquet_dataset(dataset).sort_values('KEY', ignore_index=True)
+    expected = pd.concat([small, large]).astype({'C': str}).sort_values('KEY', ignore_index=True)
+    assert (inserted, updated) == (302, 0)
+    assert isinstance(result['C'].dtype, pd.CategoricalDtype)
+    assert result['C'].astype(str).tolist() == expected['C'].tolist()
+
+
+def test_write_chunks_with_more_categories_than_the_first_chunk(datalake, tmp_path):
+    chunks = [pd.DataFrame({'C': pd.Categorical(['x'])}), pd.DataFrame({'C': pd.Categorical([f'c{i}' for i in range(300)])})]
+    file_path = str(tmp_path / 'chunks.parquet')
+
+    assert datalake.write_parquet_file_from_chunks(file_path, chunks) == 301
+    assert len(datalake.read_parquet_file(file_path).index) == 301
+
+
+def test_read_dataset_with_parts_of_different_dictionary_index_types(datalake, tmp_path):
+    dataset = str(tmp_path / 'appended.parquet')
+    datalake.append_parquet(pd.DataFrame({'KEY': ['a'], 'C': pd.Categorical(['x'])}), dataset, key=['KEY'])
+    datalake.append_parquet(pd.DataFrame({'KEY': [f'k{i}' for i in range(300)], 'C': pd.Categorical([f'c{i}' for i in range(300)])}), dataset, key=['KEY'])
+
+    assert len(datalake.read_parquet_dataset(dataset).index) == 301
+
+
+def write_csv(file_path, dataframe, encoding='utf-16'):
+    dataframe.to_csv(file_path, sep=';', index=False, encoding=encoding)
+    return str(file_path)
+
+
+def test_read_csv_in_chunks_and_write_them_to_parquet(datalake, tmp_path):
+    dataframe = pd.DataFrame({'ID': range(25), 'NAME': [f'n{i}' for i in range(25)]})
+    file_path = write_csv(tmp_path / 'raw.csv', dataframe)
+
+    chunks = list(datalake.read_csv_file_in_chunks(file_path, 10, encoding='utf-16', header=0))
+    assert [len(chunk.index) for chunk in chunks] == [10, 10, 5]
+
+    parquet_path = str(tmp_path / 'raw.parquet')
+    assert datalake.write_parquet_file_from_chunks(parquet_path, iter(chunks)) == 25
+    assert datalake.read_parquet_file(parquet_path).equals(dataframe)
+
+
+def test_write_no_chunk_creates_no_file(datalake, tmp_path):
+    parquet_path = str(tmp_path / 'empty.parquet')
+    assert datalake.write_parquet_file_from_chunks(parquet_path, iter([])) == 0
+    assert not datalake.verify_file_exists(parquet_path)
+
+
+def test_map_files_keeps_the_order_of_the_files(datalake):
+    files = [f'file_{i}' for i in range(8)]
+    expected = [file.upper() for file in files]
+    assert datalake.map_files(str.upper, files) == expected
+    assert datalake.map_files(str.upper, files, max_workers=4) == expected
+
+
+def test_map_files_rejects_an_unknown_worker_type(datalake):
+    with pytest.raises(ValueError):
+        datalake.map_files(str.upper, ['a', 'b'], max_workers=2, worker_type='fiber')
+
+
+def test_read_csv_header_only(datalake, tmp_path):
+    file_path = write_csv(tmp_path / 'header.csv', pd.DataFrame({'ANO_BO': [2020, 2021], 'NOME DA RUA': ['a', 'b']}))
+
+    header = datalake.read_csv_header_on_dataframe(file_path)
+    assert list(header.columns) == ['ANO_BO', 'NOME DA RUA']
+    assert header.empty
+
+    sample = datalake.read_csv_header_on_dataframe(file_path, sample_rows=1)
+    assert sample.to_dict('list') == {'ANO_BO': ['2020'], 'NOME DA RUA': ['a']}
+
+
+@pytest.mark.parametrize('encoding, expected', [('utf-16', 'utf-16'), ('utf-8-sig', 'utf-8-sig'), ('utf-32', 'utf-32')])
+def test_get_encoding_by_bom(datalake, tmp_path, encoding, expected):
+    file_path = write_csv(tmp_path / 'bom.csv', pd.DataFrame({'NOME': ['São Paulo']}), encoding=encoding)
+    assert datalake.get_encoding(file_path) == expected
+
+
+def test_get_encoding_is_detected_without_bom_and_cached(datalake, tmp_path):
+    file_path = write_csv(tmp_path / 'ascii.csv', pd.DataFrame({'NAME': ['plain text'] * 10}), encoding='ascii')
+    assert datalake.get_encoding(file_path) == 'ascii'
+
+    # same path, size and modification time: the cached result is returned
+    cache_key = next(key for key in Datalake._encoding_cache if key[0] == file_path)
+    Datalake._encoding_cache[cache_key] = 'cached'
+    assert datalake.get_encoding(file_path) == 'cached'
+
+
+def test_append_parquet_skips_the_stored_and_repeated_keys(datalake, tmp_path):
+    dataset = str(tmp_path / 'appended.parquet')
+
+    assert datalake.append_parquet(pd.DataFrame({'KEY': ['a', 'b', 'b'], 'V': [1, 2, 3]}), dataset, key=['KEY']) == 2
+    assert datalake.append_parquet(pd.DataFrame({'KEY': ['b', 'c'], 'V': [9, 4]}), dataset, key=['KEY']) == 1
+    assert datalake.append_parquet(pd.DataFrame({'KEY': ['a'], 'V': [9]}), dataset, key=['KEY']) == 0
+
+    manifest = datalake.read_parquet_dataset_manifest(dataset)
+    assert [part['rows'] for part in manifest['parts']] == [2, 1] and manifest['rows'] == 3
+    assert datalake.read_parquet_dataset(dataset).to_dict('list') == {'KEY': ['a', 'b', 'c'], 'V': [1, 2, 4]}
+
+
+def test_append_parquet_converts_a_legacy_file(datalake, tmp_path):
+    dataset = str(tmp_path / 'legacy.parquet')
+    pd.DataFrame({'KEY': ['a'], 'V': [1]}).to_parquet(dataset, index=False)
+
+    # without key the whole row is the key
+    assert datalake.append_parquet(pd.DataFrame({'KEY': ['a', 'a'], 'V': [1, 2]}), dataset) == 1
+    assert datalake.read_parquet_dataset(dataset).to_dict('list') == {'KEY': ['a', 'a'], 'V': [1, 2]}
+
+
+def test_append_parquet_keeps_the_legacy_file_when_the_conversion_fails(datalake, tmp_path, monkeypatch):
+    dataset = str(tmp_path / 'legacy.parquet')
+    pd.DataFrame({'KEY': ['a', 'b'], 'V': [1, 2]}).to_parquet(dataset, index=False)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(datalake, 'write_npz_file', failing_after(datalake.write_npz_file, 0))
+        with pytest.raises(RuntimeError):
+            datalake.append_parquet(pd.DataFrame({'KEY': ['c'], 'V': [3]}), dataset, key=['KEY'])
+    assert os.path.isfile(dataset)
+
+    assert datalake.append_parquet(pd.DataFrame({'KEY': ['c'], 'V': [3]}), dataset, key=['KEY']) == 1
+    assert datalake.read_parquet_dataset(dataset).to_dict('list') == {'KEY': ['a', 'b', 'c'], 'V': [1, 2, 3]}
+    assert not os.path.exists(f'{dataset}.convert')
+
+
+def test_read_parquet_dataset_that_does_not_exist(datalake, tmp_path):
+    assert datalake.read_parquet_dataset(str(tmp_path / 'missing.parquet'), columns=['KEY']).empty
+
+
+def upsert(datalake, tmp_path, dataset, *dataframes, partitions=4):
+    staging_files = []
+    for i, dataframe in enumerate(dataframes):
+        staging_files.append(str(tmp_path / f'staging.{len(list(tmp_path.iterdir()))}.{i}.parquet'))
+        dataframe.to_parquet(staging_files[-1], index=False)
+    return datalake.upsert_parquet_dataset_by_key(dataset, staging_files, 'KEY', partitions=partitions, properties={'cell_size': 0.01})
+
+
+def test_upsert_inserts_updates_and_keeps_the_last_staging_row(datalake, tmp_path):
+    dataset = str(tmp_path / 'bronze.parquet')
+    first   = pd.DataFrame({'KEY': [f'k{i}' for i in range(20)], 'V': range(20)})
+    assert upsert(datalake, tmp_path, dataset, first) == (20, 0)
+
+    # k0 changes twice (the last one wins), k1 is unchanged, k20 is new
+    second = pd.DataFrame({'KEY': ['k0', 'k1', 'k20'], 'V': [100, 1, 20]})
+    third  = pd.DataFrame({'KEY': ['k0'], 'V': [200]})
+    assert upsert(datalake, tmp_path, dataset, second, third) == (1, 1)
+
+    expected = pd.concat([first, second, third]).drop_duplicates('KEY', keep='last')
+    result   = datalake.read_parquet_dataset(dataset)
+    assert result.sort_values('KEY', ignore_index=True).equals(expected.sort_values('KEY', ignore_index=True))
+
+    manifest = datalake.read_parquet_dataset_manifest(dataset)
+    assert manifest['rows'] == 21 and manifest['partitions'] == 4 and manifest['cell_size'] == 0.01
+    # the staging files are removed
+    assert not [path for path in tmp_path.iterdir() if path.name.startswith('staging')]
+
+
+def test_upsert_retry_with_the_same_rows_changes_nothing(datalake, tmp_path):
+    dataset   = str(tmp_path / 'bronze.parquet')
+    dataframe = pd.DataFrame({'KEY': ['a', 'b'], 'V': [1, 2]})
+    upsert(datalake, tmp_path, dataset, dataframe)
+    parts = datalake.read_parquet_dataset_manifest(dataset)['parts']
+
+    assert upsert(datalake, tmp_path, dataset, dataframe) == (0, 0)
+    assert datalake.read_parquet_dataset_manifest(dataset)['parts'] == parts
+
+
+def test_upsert_rewrites_only_the_touched_partitions(datalake, tmp_path):
+    dataset = str(tmp_path / 'bronze.parquet')
+    upsert(datalake, tmp_path, dataset, pd.DataFrame({'KEY': [f'k{i}' for i in range(50)], 'V': range(50)}))
+    modified = {path.name: path.stat().st_ino for path in (tmp_path / 'bronze.parquet').glob('part-*.parquet')}
+
+    upsert(datalake, tmp_path, dataset, pd.DataFrame({'KEY': ['k7'], 'V': [-1]}))
+    changed = [path.name for path in (tmp_path / 'bronze.parquet').glob('part-*.parquet') if path.stat().st_ino != modified[path.name]]
+    assert len(modified) == 4 and len(changed) == 1
+
+
+def test_upsert_migrates_a_legacy_file(datalake, tmp_path):
+    dataset = str(tmp_path / 'bronze.parquet')
+    pd.DataFrame({'KEY': ['a', 'b'], 'V': [1, 2]}).to_parquet(dataset, index=False)
+
+    assert upsert(datalake, tmp_path, dataset, pd.DataFrame({'KEY': ['b', 'c'], 'V': [3, 4]})) == (3, 0)
+    result = datalake.read_parquet_dataset(dataset).sort_values('KEY', ignore_index=True)
+    assert result.to_dict('list') == {'KEY': ['a', 'b', 'c'], 'V': [1, 3, 4]}
+    assert not (tmp_path / 'bronze.legacy.parquet').exists()
+
+
+def test_upsert_reads_the_staging_files_once_to_route_them(datalake, tmp_path, monkeypatch):
+    dataset = str(tmp_path / 'bronze.parquet')
+    staging = str(tmp_path / 'staging.parquet')
+    pd.DataFrame({'KEY': [f'k{i}' for i in range(200)], 'V': range(200)}).to_parquet(staging, index=False)
+    reads   = []
+    read    = datalake.read_parquet_file_in_batches
+    monkeypatch.setattr(datalake, 'read_parquet_file_in_batches', lambda file_path, *args: reads.append(file_path) or read(file_path, *args))
+
+    assert datalake.upsert_parquet_dataset_by_key(dataset, [staging], 'KEY', partitions=16) == (200, 0)
+    # one pass to hash the rows and one pass to route them, whatever the number of touched partitions
+    assert len(datalake.read_parquet_dataset_manifest(dataset)['parts']) == 16
+    assert reads.count(staging) == 2
+    assert sorted(datalake.read_parquet_dataset(dataset)['V']) == list(range(200))
+    assert not [name for name in os.listdir(dataset) if '.route.' in name]
+
+
+def failing_after(function, calls):
+    count = []
+    def wrapper(*args, **kwargs):
+        count.append(1)
+        if len(count) > calls:
+            raise RuntimeError('simulated failure')
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def test_upsert_retry_after_a_failed_legacy_migration_keeps_every_row(datalake, tmp_path, monkeypatch):
+    dataset = str(tmp_path / 'bronze.parquet')
+    pd.DataFrame({'KEY': [f'k{i}' for i in range(30)], 'V': range(30)}).to_parquet(dataset, index=False)
+    staging = str(tmp_path / 'staging.parquet')
+    pd.DataFrame({'KEY': ['k0', 'new'], 'V': [-1, -2]}).to_parquet(staging, index=False)
+
+    # the second partition fails: the legacy file is already moved and one part is written
+    with monkeypatch.context() as patch:
+        patch.setattr(datalake, 'write_parquet_file_from_chunks', failing_after(datalake.write_parquet_file_from_chunks, 1))
+        with pytest.raises(RuntimeError):
+            datalake.upsert_parquet_dataset_by_key(dataset, [staging], 'KEY', partitions=4)
+    assert datalake.read_parquet_dataset(dataset).empty
+
+    assert datalake.upsert_parquet_dataset_by_key(dataset, [staging], 'KEY', partitions=4) == (31, 0)
+    result = datalake.read_parquet_dataset(dataset).set_index('KEY')['V']
+    assert len(result.index) == 31 and result['k0'] == -1 and result['k1'] == 1
+    assert not (tmp_path / 'bronze.legacy.parquet').exists()
+
+
+def test_upsert_failed_before_the_swap_leaves_the_dataset_unchanged(datalake, tmp_path, monkeypatch):
+    dataset = str(tmp_path / 'bronze.parquet')
+    upsert(datalake, tmp_path, dataset, pd.DataFrame({'KEY': [f'k{i}' for i in range(20)], 'V': range(20)}))
+    before  = datalake.read_parquet_dataset(dataset)
+    staging = str(tmp_path / 'staging.parquet')
+    pd.DataFrame({'KEY': [f'n{i}' for i in range(20)], 'V': range(20)}).to_parquet(staging, index=False)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(datalake, 'write_json_file', failing_after(datalake.write_json_file, 0))
+        with pytest.raises(RuntimeError):
+            datalake.upsert_parquet_dataset_by_key(dataset, [staging], 'KEY')
+    assert datalake.read_parquet_dataset(dataset).equals(before)
+
+    # the rows written before the failure are not inserted twice
+    assert datalake.upsert_parquet_dataset_by_key(dataset, [staging], 'KEY') == (20, 0)
+    assert datalake.read_parquet_dataset(dataset)['KEY'].is_unique
+    assert not [name for name in os.listdir(dataset) if name.endswith('.merge') or '.pending.' in name]
+
+
+def test_upsert_failed_during_the_swap_is_completed_by_the_next_run(datalake, tmp_path, monkeypatch):
+    dataset = str(tmp_path / 'bronze.parquet')
+    upsert(datalake, tmp_path, dataset, pd.DataFrame({'KEY': [f'k{i}' for i in range(20)], 'V': range(20)}))
+    staging = str(tmp_path / 'staging.parquet')
+    pd.DataFrame({'KEY': [f'k{i}' for i in range(20)], 'V': range(100, 120)}).to_parquet(staging, index=False)
+
+    # only the first part is replaced
+    with monkeypatch.context() as patch:
+        patch.setattr(datalake, 'move_and_overwrite_file_from_to', failing_after(datalake.move_and_overwrite_file_from_to, 1))
+        with pytest.raises(RuntimeError):
+            datalake.upsert_parquet_dataset_by_key(dataset, [staging], 'KEY')
+
+    assert datalake.upsert_parquet_dataset_by_key(dataset, [staging], 'KEY') == (0, 0)
+    result = datalake.read_parquet_dataset(dataset).set_index('KEY')['V']
+    assert result.to_dict() == {f'k{i}': 100 + i for i in range(20)}
+
+
+def test_upsert_rebuilds_a_missing_key_index(datalake, tmp_path):
+    dataset   = str(tmp_path / 'bronze.parquet')
+    dataframe = pd.DataFrame({'KEY': ['a', 'b'], 'V': [1, 2]})
+    upsert(datalake, tmp_path, dataset, dataframe)
+    os.remove(os.path.join(dataset, '_index.npz'))
+
+    assert upsert(datalake, tmp_path, dataset, dataframe) == (0, 0)
+    assert len(datalake.read_parquet_dataset(dataset).index) == 2
+
+
+def test_read_parquet_file_with_columns_and_filters(datalake, tmp_path):
+    file_path = str(tmp_path / 'infos.parquet')
+    datalake.write_parquet_file_from_dataframe(file_path, pd.DataFrame({'CELL': [1, 2, 3, 4], 'V': ['a', 'b', 'c', 'd'], 'W': [0.0] * 4}))
+
+    result = datalake.read_parquet_file(file_path, columns=['V'], filters=[('CELL', '>=', 2), ('CELL', '<', 4)])
+    assert result.to_dict('list') == {'V': ['b', 'c']}
+
+    result = datalake.read_parquet_file(file_path, columns=['CELL'], dtype_backend='pyarrow')
+    assert isinstance(result['CELL'].dtype, pd.ArrowDtype)
+
+
+def test_update_parquet_dataset_rebuilds_the_key_index(datalake, tmp_path):
+    dataset = str(tmp_path / 'bronze.parquet')
+    upsert(datalake, tmp_path, dataset, pd.DataFrame({'KEY': [f'k{i}' for i in range(10)], 'V': range(10)}))
+
+    datalake.update_parquet_dataset(dataset, lambda df: df.assign(CELL=df['V'] * 2), {'cell_size': 0.02})
+
+    result = datalake.read_parquet_dataset(dataset)
+    assert (result['CELL'] == result['V'] * 2).all()
+    assert datalake.read_parquet_dataset_manifest(dataset)['cell_size'] == 0.02
+    # the index has the hashes of the updated rows: upserting them again changes nothing
+    assert upsert(datalake, tmp_path, dataset, result) == (0, 0)
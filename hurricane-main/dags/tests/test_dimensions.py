@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from hurricane.data.transform.dimensions import Dimensions
+
+
+def segments_dataframe():
+    # two segments on the equator: 1 -> 2 -> 3, the vertex 4 has no segment
+    return pd.DataFrame({
+        'seg_id'       : [1, 2],
+        'oneway'       : [True, True],
+        'ver_id_star'  : [1, 2],
+        'ver_id_final' : [2, 3],
+        'lon_star'     : [0.0, 1.0],
+        'lat_star'     : [0.0, 0.0],
+        'lon_final'    : [1.0, 2.0],
+        'lat_final'    : [0.0, 0.0],
+    })
+
+
+def test_nearest_segments_by_points():
+    transform = Dimensions(None, None)
+    df_points = pd.DataFrame({'LATITUDE': [0.1, 0.1, 5.0], 'LONGITUDE': [0.4, 1.6, 5.0], 'ver_id': [2, 2, 4]})
+
+    result = transform.get_nearest_segments_by_points(df_points, segments_dataframe())
+
+    assert result[:2].tolist() == [1.0, 2.0]
+    assert np.isnan(result[2])
+
+
+def edges_dataframe():
+    from shapely.geometry import LineString
+    return pd.DataFrame({
+        'geometry' : [LineString([(0, 0), (0.0018, 0)]), LineString([(0, 0), (0.0018, 0)]), LineString([(0, 1), (0, 1.0001)])],
+        'oneway'   : [True, True, False],
+        'name'     : ['Rua A', 'Rua A', np.nan],
+        'highway'  : ['primary', 'primary', ['residential', 'service']],
+    })
+
+
+def test_create_segments_splits_the_edges_and_drops_duplicates():
+    df_segments = Dimensions(None, None).create_segments(edges_dataframe())
+
+    # the first edge is split in two segments of 0.0009 degrees, its copy is dropped, the short edge is kept whole
+    assert df_segments['seg_id'].tolist() == [1, 2, 3]
+    assert df_segments['lon_star'].tolist() == [0.0, 0.0009, 0.0]
+    assert df_segments['lon_final'].tolist() == [0.0009, 0.0018, 0.0]
+    assert df_segments['name'].tolist() == [['Rua A'], ['Rua A'], []]
+    assert df_segments['highway'].tolist()[2] == ['residential', 'service']
+    assert np.allclose(df_segments['length'], [100.08, 100.08, 11.12], atol=0.01)
+
+
+def model_dataframes():
+    df_vertices = pd.DataFrame({'ver_id': [1, 2, 3, 4], 'lon': [0.0, 1.0, 2.0, 1.0], 'lat': [0.0, 0.0, 0.0, 1.0], 'zone_id': 0})
+    df_segments = segments_dataframe().assign(name=[['a'], ['b']], highway=[['x'], ['y']], length=[1.0, 1.0])
+    return df_vertices, df_segments
+
+
+def test_prepared_model_is_read_back_by_segment_ids(datalake, tmp_path):
+    from hurricane.data.extract.dimensions import Dimensions as ExtractDimensions
+    extract   = ExtractDimensions(datalake, str(tmp_path))
+    transform = Dimensions(datalake, str(tmp_path))
+
+    vertice_index, df_prepared_segments, segment_adjacency = transform.create_prepared_model(*model_dataframes())
+    datalake.write_pickle_file(extract.silver_vertice_index_file_path, vertice_index)
+    datalake.write_arrow_file(extract.silver_prepared_segment_file_path, df_prepared_segments)
+    datalake.write_npz_file(extract.silver_segment_adjacency_file_path, segment_adjacency.to_dict())
+    assert extract.has_prepared_model_in_silver()
+
+    ver_ids, _ = extract.get_vertice_index_from_silver().query(np.array([1.9]), np.array([0.1]))
+    _, seg_ids = extract.get_segment_adjacency_from_silver().incident(ver_ids)
+    assert ver_ids.tolist() == [3] and seg_ids.tolist() == [2]
+    assert extract.get_prepared_segments_from_silver(seg_ids)['seg_id'].tolist() == [2]
+    assert extract.get_prepared_segments_from_silver(np.array([], dtype=int)).empty
+
+
+def test_filter_uniqueway_segments_keeps_one_way_of_each_twoway_pair():
+    df_segments = pd.DataFrame({
+        'seg_id'       : [1, 2, 3, 4, 5],
+        'oneway'       : [False, False, True, True, False],
+        'name'         : [['a'], ['a'], ['b'], ['b'], ['c']],
+        'highway'      : [['x'], ['x'], ['y'], ['y'], ['z']],
+        'lon_star'     : [1.0, 0.0, 0.0, 1.0, 2.0],
+        'lat_star'     : [0.0, 0.0, 1.0, 1.0, 2.0],
+        'lon_final'    : [0.0, 1.0, 1.0, 0.0, 2.0],
+        'lat_final'    : [0.0, 0.0, 1.0, 1.0, 2.0],
+        'length'       : [1.0, 1.0, 1.0, 1.0, 1.0],
+        'ver_id_star'  : [2, 1, 3, 4, 5],
+        'ver_id_final' : [1, 2, 4, 3, 5],
+    })
+
+    result = Dimensions(None, None).filter_uniqueway_segments(df_segments)
+
+    # the oneway segments are kept both ways, the twoway pair keeps its lowest seg_id oriented from the lowest
+    # vertex id, the circular segment 5 is dropped
+    assert result['seg_id'].tolist() == [3, 4, 1]
+    twoway = result[result['seg_id'] == 1].iloc[0]
+    assert (twoway['ver_id_star'], twoway['ver_id_final'], twoway['lon_star'], twoway['lon_final']) == (1, 2, 0.0, 1.0)
+
+
+def test_filter_uniqueway_segments_without_twoway_segments():
+    df_segments = segments_dataframe().assign(name=[['a'], ['b']], highway=[['x'], ['y']], length=[1.0, 1.0])
+    assert Dimensions(None, None).filter_uniqueway_segments(df_segments)['seg_id'].tolist() == [1, 2]
+
+
+def test_create_vertices_numbers_every_vertex():
+    df_vertices = Dimensions(None, None).create_vertices(segments_dataframe())
+    assert df_vertices.to_dict('list') == {'ver_id': [1, 2, 3], 'lon': [0.0, 1.0, 2.0], 'lat': [0.0, 0.0, 0.0]}
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from hurricane.data.transform.domains import Domains
+
+
+def test_get_times_derives_the_date_fields_of_each_distinct_time():
+    domain = Domains(None, None)
+    df = pd.DataFrame({
+        'PERIOD' : pd.Categorical(['A noite', 'A noite', 'De manha', None]),
+        'DATE'   : pd.to_datetime(['2024-01-01 22:00', '2024-01-01 22:00', '2024-01-07 08:00', '2024-01-08 08:00']),
+    })
+
+    df_times = domain.get_times(df)
+
+    assert df_times.to_dict('list') == {
+        'period'  : ['A noite', 'De manha'],
+        'weekday' : ['Segunda-Feira', 'Domingo'],
+        'day'     : [1, 7],
+        'month'   : [1, 1],
+        'year'    : [2024, 2024],
+    }
+
+
+def test_get_date_key():
+    domain = Domains(None, None)
+    keys = domain.get_date_key(pd.Series([2024, 1999]), pd.Series([1, 12]), pd.Series([31, 5]))
+    assert keys.tolist() == [20240131, 19991205] and keys.dtype == np.int64
+
+
+def test_period_codes_are_kept_and_new_periods_get_the_next_codes():
+    domain = Domains(None, None)
+    df_silver_times = pd.DataFrame({'period': ['De manha', 'A noite', 'De manha'], 'period_code': [1, 2, 1]})
+
+    period_codes = domain.assign_period_codes(['Madrugada', 'A noite', None, 'A tarde'], domain.get_period_codes(df_silver_times))
+
+    assert period_codes == {'De manha': 1, 'A noite': 2, 'A tarde': 3, 'Madrugada': 4}
+    assert domain.get_period_codes(pd.DataFrame()) == {}
+
+
+def test_get_time_ids_by_integer_time_key():
+    domain = Domains(None, None)
+    df_times = domain.add_time_key(pd.DataFrame({
+        'period' : ['A noite', 'De manha', 'A noite'],
+        'day'    : [1, 1, 2],
+        'month'  : [1, 1, 1],
+        'year'   : [2024, 2024, 2024],
+    }), {'A noite': 1, 'De manha': 2}).assign(time_id=[7, 8, 9])
+    assert df_times['time_key'].tolist() == [2024010101, 2024010102, 2024010201]
+
+    periods = pd.Categorical(['A noite', 'A noite', 'De manha', 'Madrugada', 'A noite'])
+    dates   = pd.Series(pd.to_datetime(['2024-01-02 23:00', '2024-01-01 21:00', '2024-01-01 08:00', '2024-01-01 03:00', None]))
+
+    # unknown period or date and missing date give -1
+    assert domain.get_time_ids(df_times, periods, dates).tolist() == [9, 7, 8, -1, -1]
+    assert domain.get_time_ids(df_times.iloc[:0], periods, dates).tolist() == [-1] * 5
+
+
+def bronze_times(*rows):
+    return pd.DataFrame([{'period': period, 'weekday': 'Segunda-Feira', 'day': day, 'month': 1, 'year': 2024} for period, day in rows])
+
+
+def test_silver_time_domain_migrates_a_table_without_time_key(datalake, tmp_path):
+    from hurricane.tasks.process_domains import Domains as DomainTasks
+    domain = Domains(datalake, str(tmp_path))
+    # silver time table written before the time key
+    datalake.write_parquet_file_from_dataframe(domain.silver_time_file_path, bronze_times(('De manha', 1), ('A noite', 1)).assign(time_id=[1, 2]))
+    datalake.write_parquet_file_from_dataframe(domain.bronze_time_file_path, bronze_times(('A noite', 1), ('A noite', 2), ('Madrugada', 2)))
+
+    DomainTasks.process_silver_time_domain(dag_id='test', adl=None, workdir=str(tmp_path))
+
+    df_times = domain.get_times_from_silver()
+    assert df_times['time_id'].tolist() == [1, 2, 3, 4]
+    assert df_times['period_code'].tolist() == [2, 1, 1, 3]
+    assert df_times['time_key'].tolist() == [2024010102, 2024010101, 2024010201, 2024010203]
+
+
+def test_silver_time_domain_allocates_the_ids_after_the_high_water_mark(datalake, tmp_path):
+    from hurricane.tasks.process_domains import Domains as DomainTasks
+    domain = Domains(datalake, str(tmp_path))
+    datalake.write_parquet_file_from_dataframe(domain.bronze_time_file_path, bronze_times(('A noite', 1), ('A noite', 2)))
+    DomainTasks.process_silver_time_domain(dag_id='test', adl=None, workdir=str(tmp_path))
+    assert domain.get_time_sequence().last_value() == 2
+
+    # the ids 3 to 5 were allocated by a run whose table was not written: they are not reused
+    domain.get_time_sequence().allocate(3)
+    datalake.write_parquet_file_from_dataframe(domain.bronze_time_file_path, bronze_times(('A noite', 1), ('A noite', 3)))
+    DomainTasks.process_silver_time_domain(dag_id='test', adl=None, workdir=str(tmp_path))
+
+    assert domain.get_times_from_silver()['time_id'].tolist() == [1, 2, 6]
@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hurricane.schemas.files_schema import FilesSchema
+
+
+def schema(*columns):
+    return {'columns': [{'name': name, 'type': ctype, 'required': True} for name, ctype in columns]}
+
+
+def test_validate_sample_types_counts_the_invalid_values():
+    files_schema = FilesSchema('test')
+    sample = pd.DataFrame({
+        'ANO_BO' : ['2020', 'x', '', None],
+        'LAT'    : ['-22,9', '-22.8', 'y', 'z'],
+        'DATE'   : ['2024-01-01', '2024-13-01', '2024-02-02', '2024-02-03'],
+        'NAME'   : ['a', 'b', 'c', 'd'],
+    })
+    invalid = files_schema.validate_sample_types(schema(('ANO_BO', 'integer'), ('LAT', 'float'), ('DATE', 'date'), ('NAME', 'str')), sample)
+
+    # empty values are not counted, text columns are not validated
+    assert invalid == {'ANO_BO': (1, 2), 'LAT': (2, 4), 'DATE': (1, 4)}
+
+
+def test_conversion_plan_is_compiled_once_per_schema():
+    files_schema = FilesSchema('test')
+    layout = schema(('ANO_BO', 'integer'), ('LAT', 'decimal'), ('DATE', 'datetime'), ('NAME', 'string'))
+    layout['columns'][2]['format'] = '%d/%m/%Y'
+
+    plan = files_schema.get_conversion_plan(layout)
+    assert plan == {'str': ['NAME'], 'category': [], 'int': ['ANO_BO'], 'float': ['LAT'], 'date': [('DATE', '%d/%m/%Y')]}
+    assert files_schema.get_conversion_plan(layout) is plan
+
+
+def test_conversion_plan_rejects_an_unknown_type():
+    with pytest.raises(Exception):
+        FilesSchema('test').get_conversion_plan(schema(('GEOM', 'geometry')))
+
+
+def test_convert_columns_by_type():
+    files_schema = FilesSchema('test')
+    layout = schema(('ANO_BO', 'integer'), ('LAT', 'float'), ('DATE', 'date'), ('NAME', 'str'))
+    layout['columns'][2]['format'] = '%d/%m/%Y'
+    dataframe = pd.DataFrame({'ANO_BO': ['2020', '2021.7', 'x'], 'LAT': ['-22,9', '1.5', ''], 'DATE': ['31/01/2024', '2024-01-31', None], 'NAME': ['a', 'b', 'c']})
+
+    result = files_schema.convert_columns_by_type(dataframe, layout)
+
+    assert result['ANO_BO'].tolist()[:2] == [2020, 2021] and result['ANO_BO'].isna().tolist() == [False, False, True]
+    assert result['LAT'].tolist()[:2] == [-22.9, 1.5] and np.isnan(result['LAT'].iloc[2])
+    assert result['DATE'].tolist()[0] == pd.Timestamp('2024-01-31') and result['DATE'].isna().tolist()[1:] == [True, True]
+    assert result['NAME'].tolist() == ['a', 'b', 'c']
+
+
+def test_convert_columns_rejects_columns_outside_the_schema():
+    with pytest.raises(Exception):
+        FilesSchema('test').convert_columns_by_type(pd.DataFrame({'OTHER': ['1']}), schema(('ANO_BO', 'integer')))
+
+
+def test_category_columns_are_converted_and_concatenated_as_categorical():
+    files_schema = FilesSchema('test')
+    layout = schema(('KIND', 'category'), ('NAME', 'str'))
+    first  = files_schema.convert_columns_by_type(pd.DataFrame({'KIND': ['a', 'b'], 'NAME': ['x', 'y']}), layout)
+    second = files_schema.convert_columns_by_type(pd.DataFrame({'KIND': ['c'], 'NAME': ['z']}), layout)
+    assert isinstance(first['KIND'].dtype, pd.CategoricalDtype)
+
+    result = FilesSchema.concat_dataframes([first, pd.DataFrame(), second])
+    assert isinstance(result['KIND'].dtype, pd.CategoricalDtype)
+    assert result['KIND'].tolist() == ['a', 'b', 'c']
+    assert FilesSchema.concat_dataframes([]).empty
+
+
+def test_configured_date_columns_are_read_day_first():
+    configs = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'hurricane', 'configs')
+    with open(os.path.join(configs, 'pmerj-crimes.json')) as json_file:
+        layout = json.load(json_file)['raw_interfaces'][0]
+    # every date column declares its format, none is inferred
+    assert all(column.get('format') for column in layout['columns'] if column['type'].upper() in ['DATE', 'DATETIME'])
+
+    df = pd.DataFrame({'DATAOCORRENCIA': ['02/03/2024', '13/01/2024', '2024-03-02'], 'BO_INICIADO': ['02/03/2024 21:05:09', '13/01/2024 00:00:00', '']})
+    result = FilesSchema('test').convert_columns_by_type(df, layout)
+
+    assert result['DATAOCORRENCIA'].tolist()[:2] == [pd.Timestamp('2024-03-02'), pd.Timestamp('2024-01-13')]
+    # a value out of the configured format is invalid
+    assert pd.isna(result['DATAOCORRENCIA'][2]) and pd.isna(result['BO_INICIADO'][2])
+    assert result['BO_INICIADO'][0] == pd.Timestamp('2024-03-02 21:05:09')
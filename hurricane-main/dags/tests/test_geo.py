@@ -0,0 +1,125 @@
+import numpy as np
+
+from shapely.geometry import box
+
+from hurricane.utils.geo import NearestVertexIndex, PolygonIndex, VertexAdjacency, grid_cells, haversine, haversine_many_to_many, haversine_one_to_many, nearest_segments
+
+
+def test_polygon_index_first_polygon_wins():
+    # the two squares overlap on x in [1, 2]
+    index = PolygonIndex([box(0, 0, 2, 2), box(1, 0, 3, 2)], [10, 20])
+    result = index.associate(np.array([0.5, 1.5, 2.5, 5.0]), np.array([1.0, 1.0, 1.0, 1.0]))
+    assert result.tolist() == [10, 10, 20, 0]
+
+
+def test_polygon_index_priority_follows_the_given_order():
+    index = PolygonIndex([box(1, 0, 3, 2), box(0, 0, 2, 2)], [20, 10])
+    assert index.associate(np.array([1.5]), np.array([1.0])).tolist() == [20]
+
+
+def test_polygon_index_ignores_missing_geometries():
+    index = PolygonIndex([None, np.nan, box(0, 0, 1, 1)], [1, 2, 3])
+    assert index.associate(np.array([0.5, 0.5]), np.array([0.5, 5.0]), default=-1).tolist() == [3, -1]
+
+
+def test_polygon_index_without_polygons_or_points():
+    assert PolygonIndex([], []).associate(np.array([0.5]), np.array([0.5])).tolist() == [0]
+    assert len(PolygonIndex([box(0, 0, 1, 1)], [1]).associate(np.array([]), np.array([]))) == 0
+
+
+def test_nearest_vertex_index_matches_the_brute_force():
+    rng     = np.random.default_rng(0)
+    lon     = -43.5 + rng.random(500) * 0.5
+    lat     = -23.0 + rng.random(500) * 0.5
+    index   = NearestVertexIndex(np.arange(1, 501), lon, lat)
+    p_lon   = -43.5 + rng.random(200) * 0.5
+    p_lat   = -23.0 + rng.random(200) * 0.5
+
+    ver_ids, distance = index.query(p_lon, p_lat)
+
+    brute = haversine(p_lat[:, None], p_lon[:, None], lat[None, :], lon[None, :])
+    assert (ver_ids == brute.argmin(axis=1) + 1).all()
+    assert np.allclose(distance, brute.min(axis=1))
+
+
+def test_nearest_segments_picks_the_closest_candidate_of_each_point():
+    # point 0 (lon 0, lat 0) has a far and a near candidate, point 1 has one candidate
+    point_index = np.array([0, 0, 1])
+    lon, lat    = np.array([0.0, 0.0, 1.0]), np.array([0.0, 0.0, 1.0])
+    nearest, distance = nearest_segments(point_index, lon, lat,
+                                         np.array([0.5, -0.1, 1.0]), np.array([-1.0, -1.0, 1.0]),
+                                         np.array([0.5, -0.1, 2.0]), np.array([1.0, 1.0, 1.0]))
+    assert nearest.tolist() == [1, 2]
+    assert distance[1] == 0.0
+    assert np.isclose(distance[0], haversine(0.0, 0.0, 0.0, -0.1), rtol=1e-3)
+
+
+def test_nearest_segments_clamps_to_the_segment_ends_and_keeps_the_first_tie():
+    # both candidates end 1 degree of longitude away from the point, the first one is kept
+    point_index = np.array([0, 0])
+    lon, lat    = np.zeros(2), np.zeros(2)
+    nearest, distance = nearest_segments(point_index, lon, lat,
+                                         np.array([1.0, -1.0]), np.array([0.0, 0.0]),
+                                         np.array([2.0, -2.0]), np.array([0.0, 0.0]))
+    assert nearest.tolist() == [0]
+    assert np.isclose(distance[0], haversine(0.0, 0.0, 0.0, 1.0), rtol=1e-3)
+
+
+def test_nearest_segments_of_a_degenerate_segment():
+    nearest, distance = nearest_segments(np.array([0]), np.array([0.0]), np.array([0.0]),
+                                         np.array([0.0]), np.array([1.0]), np.array([0.0]), np.array([1.0]))
+    assert nearest.tolist() == [0]
+    assert np.isclose(distance[0], haversine(0.0, 0.0, 1.0, 0.0), rtol=1e-3)
+
+
+def test_nearest_segments_without_candidates():
+    empty = np.array([])
+    nearest, distance = nearest_segments(np.array([], dtype=int), empty, empty, empty, empty, empty, empty)
+    assert len(nearest) == 0 and len(distance) == 0
+
+
+def test_vertex_adjacency_incident_segments():
+    adjacency = VertexAdjacency.from_segments([1, 2, 3], [10, 10, 20], [20, 30, 30])
+    group, seg_ids = adjacency.incident(np.array([30, 99, 10]))
+    # the unknown vertex 99 has no segment
+    assert group.tolist() == [0, 0, 2, 2]
+    assert seg_ids.tolist() == [2, 3, 1, 2]
+
+
+def test_vertex_adjacency_round_trip_and_empty():
+    adjacency = VertexAdjacency(**VertexAdjacency.from_segments([1], [10], [20]).to_dict())
+    assert adjacency.incident(np.array([20]))[1].tolist() == [1]
+
+    group, seg_ids = VertexAdjacency.from_segments([], [], []).incident(np.array([10]))
+    assert len(group) == 0 and len(seg_ids) == 0
+
+
+def test_haversine_known_distances():
+    # one degree of latitude and a quarter of the equator
+    assert np.isclose(haversine(0.0, 0.0, 1.0, 0.0), 111.195, atol=1e-3)
+    assert np.isclose(haversine(0.0, 0.0, 0.0, 90.0), 2 * np.pi * 6371.0 / 4)
+    assert haversine(-22.9, -43.2, -22.9, -43.2) == 0.0
+
+
+def test_haversine_one_and_many_to_many():
+    lats, lons = np.array([0.0, 1.0, 2.0]), np.array([0.0, 0.0, 0.0])
+    assert np.allclose(haversine_one_to_many(0.0, 0.0, lats, lons), [0.0, 111.195, 222.390], atol=1e-3)
+
+    # rows computed in chunks smaller than the input
+    distances = haversine_many_to_many(lats, lons, lats[:2], lons[:2], chunk_size=2)
+    assert distances.shape == (3, 2)
+    assert np.allclose(distances, haversine(lats[:, None], lons[:, None], lats[None, :2], lons[None, :2]))
+
+
+def test_grid_cells_follow_the_z_order():
+    # the four cells of a 2 x 2 block get four contiguous codes
+    lon = np.array([0.005, 0.015, 0.005, 0.015])
+    lat = np.array([0.005, 0.005, 0.015, 0.015])
+    cells = grid_cells(lon - 180, lat - 90, cell_size=0.01)
+    assert cells.tolist() == [0, 1, 2, 3]
+
+
+def test_grid_cells_of_points_in_the_same_cell():
+    cells = grid_cells(np.array([-43.2001, -43.2009, -43.1999]), np.array([-22.9001, -22.9009, -22.9001]), cell_size=0.01)
+    assert cells.dtype == np.int64
+    assert cells[0] == cells[1] != cells[2]
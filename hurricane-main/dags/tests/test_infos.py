@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hurricane.data.extract.infos import Infos
+from hurricane.schemas.files_schema import FilesSchema
+from hurricane.utils.geo import grid_cells
+
+
+def config(**properties):
+    return dict({'fact_tablename': 'crime', 'cell_size': 0.01, 'raw_interfaces': [{'name': 'vehicles_rob'}, {'name': 'phones_rob'}]}, **properties)
+
+
+def write_bronze(datalake, workdir, name, rows, seed):
+    rng = np.random.default_rng(seed)
+    dataframe = pd.DataFrame({
+        'KEY'       : [f'{name}{i}' for i in range(rows)],
+        'DATE'      : pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 30, rows), 'D'),
+        'PERIOD'    : rng.choice(['A noite', 'De manha'], rows),
+        'LATITUDE'  : -22.9 + rng.random(rows) * 0.1,
+        'LONGITUDE' : -43.3 + rng.random(rows) * 0.1,
+    })
+    dataframe['CELL'] = grid_cells(dataframe['LONGITUDE'], dataframe['LATITUDE'], 0.01)
+    staging = f'{workdir}/bronze/{name}.staging.0.parquet'
+    datalake.write_parquet_file_from_dataframe(staging, dataframe)
+    datalake.upsert_parquet_dataset_by_key(f'{workdir}/bronze/{name}.parquet', [staging], 'KEY', partitions=2)
+    return dataframe
+
+
+def test_create_partitions_without_bronze(datalake, tmp_path):
+    assert Infos(datalake, str(tmp_path), config()).create_partitions() is None
+
+
+def test_partitions_cover_every_bronze_row_once(datalake, tmp_path):
+    workdir = str(tmp_path)
+    rows    = len(write_bronze(datalake, workdir, 'vehicles_rob', 300, 0).index) + len(write_bronze(datalake, workdir, 'phones_rob', 200, 1).index)
+    info    = Infos(datalake, workdir, config(partition_target_rows=100, max_partitions=4))
+
+    manifest   = info.create_partitions()
+    partitions = manifest['partitions']
+    assert manifest['cell_size'] == 0.01
+    assert [p['id'] for p in partitions] == [0, 1, 2, 3]
+    # contiguous ranges, open at both ends
+    assert partitions[0]['cell_start'] is None and partitions[-1]['cell_end'] is None
+    assert all(partitions[i]['cell_end'] == partitions[i + 1]['cell_start'] for i in range(len(partitions) - 1))
+
+    keys = pd.concat([info.get_infos_partition_from_bronze(p)['KEY'] for p in partitions])
+    assert len(keys.index) == rows and keys.is_unique
+
+
+def test_partitions_are_limited_by_max_partitions(datalake, tmp_path):
+    workdir = str(tmp_path)
+    write_bronze(datalake, workdir, 'vehicles_rob', 300, 0)
+    assert len(Infos(datalake, workdir, config(partition_target_rows=10, max_partitions=3)).create_partitions()['partitions']) == 3
+    assert len(Infos(datalake, workdir, config(partition_target_rows=1000)).create_partitions()['partitions']) == 1
+
+
+def test_partitions_are_planned_again_when_bronze_grows(datalake, tmp_path):
+    workdir = str(tmp_path)
+    write_bronze(datalake, workdir, 'vehicles_rob', 250, 0)
+    info     = Infos(datalake, workdir, config(partition_target_rows=100, max_partitions=8))
+    manifest = info.create_partitions()
+    assert len(manifest['partitions']) == 3
+    assert info.is_partitions_outdated(None)
+    assert not info.is_partitions_outdated(manifest)
+    assert Infos(datalake, workdir, config(cell_size=0.02, partition_target_rows=100, max_partitions=8)).is_partitions_outdated(manifest)
+
+    # still three partitions of about 100 rows
+    write_bronze(datalake, workdir, 'vehicles_rob', 300, 0)
+    assert not info.is_partitions_outdated(manifest)
+
+    write_bronze(datalake, workdir, 'phones_rob', 1, 1)
+    assert info.is_partitions_outdated(manifest)
+    assert len(info.create_partitions()['partitions']) == 4
+
+
+class TaskInstance:
+    def __init__(self, model_changed):
+        self.model_changed = model_changed
+
+    def xcom_pull(self, key):
+        return {'model_changed': self.model_changed}[key]
+
+
+def test_merge_add_infos():
+    from hurricane.tasks.process_infos import Infos as InfoTasks
+    df_gold  = pd.DataFrame({'time_id': [1, 1], 'seg_id': [10.0, 11.0], 'vehicles_rob': [2, 1]})
+    df_delta = pd.DataFrame({'time_id': [1, 2], 'seg_id': [10.0, 10.0], 'vehicles_rob': [1, 0], 'phones_rob': [3, 1]})
+
+    result = InfoTasks.merge_add_infos(df_gold, df_delta)
+
+    assert result.to_dict('list') == {
+        'time_id'      : [1, 1, 2],
+        'seg_id'       : [10.0, 11.0, 10.0],
+        'vehicles_rob' : [3, 1, 0],
+        'phones_rob'   : [3, 0, 1],
+    }
+
+
+def write_silver(datalake, info, partition, rows, delta=True):
+    dataframe = pd.DataFrame([{'KEY': key, 'DATE': pd.Timestamp(date), 'PERIOD': 'A noite', 'LATITUDE': 0.0, 'LONGITUDE': 0.0,
+                               'INFO': kind, 'seg_id': seg_id} for key, date, kind, seg_id in rows])
+    dataframe['INFO'] = dataframe['INFO'].astype('category')
+    silver = info.get_infos_partition_from_silver(partition)
+    datalake.write_parquet_file_from_dataframe(info.get_infos_filename_partition(partition), FilesSchema.concat_dataframes([silver, dataframe]))
+    if delta:
+        datalake.write_parquet_file_from_dataframe(info.get_infos_delta_filename_partition(partition), dataframe)
+
+
+def write_silver_model(datalake, workdir):
+    from hurricane.data.transform.domains import Domains
+    info   = Infos(datalake, workdir, config())
+    domain = Domains(datalake, workdir)
+    datalake.write_json_file(info.silver_partitions, {'cell_size': 0.01, 'partitions': [{'id': 0, 'cell_start': None, 'cell_end': 5}, {'id': 1, 'cell_start': 5, 'cell_end': None}]})
+    datalake.write_parquet_file_from_dataframe(domain.silver_time_file_path, domain.add_time_key(pd.DataFrame({
+        'period': ['A noite'] * 2, 'weekday': ['Segunda-Feira', 'Terça-Feira'], 'day': [1, 2], 'month': [1, 1], 'year': [2024, 2024]}), {'A noite': 1}).assign(time_id=[1, 2]))
+    return info, {'dag_id': 'test', 'adl': None, 'workdir': workdir, 'config_json': config()}
+
+
+def test_process_infos_adds_the_deltas_like_a_full_rebuild(datalake, tmp_path):
+    from hurricane.tasks.process_infos import Infos as InfoTasks
+    info, args = write_silver_model(datalake, str(tmp_path))
+
+    # first run: full build, the deltas are removed
+    write_silver(datalake, info, 0, [('a', '2024-01-01', 'vehicles_rob', 10.0), ('b', '2024-01-01', 'vehicles_rob', 10.0)])
+    InfoTasks.process_infos(ti=TaskInstance(True), **args)
+    assert info.list_infos_deltas_from_silver() == []
+
+    # next run: new rows in both partitions, with an info type gold does not have yet
+    write_silver(datalake, info, 0, [('c', '2024-01-01', 'vehicles_rob', 10.0), ('d', '2024-01-02', 'phones_rob', 10.0)])
+    write_silver(datalake, info, 1, [('e', '2024-01-02', 'phones_rob', 20.0)])
+    InfoTasks.process_infos(ti=TaskInstance(False), **args)
+    incremental = info.get_infos_from_gold()
+    assert info.list_infos_deltas_from_silver() == []
+
+    # without new rows gold is kept
+    InfoTasks.process_infos(ti=TaskInstance(False), **args)
+    assert info.get_infos_from_gold().equals(incremental)
+
+    InfoTasks.process_infos(ti=TaskInstance(True), **args)
+    full = info.get_infos_from_gold()
+    assert incremental.equals(full[incremental.columns])
+    assert incremental.to_dict('list') == {
+        'time_id'      : [1, 2, 2],
+        'seg_id'       : [10.0, 10.0, 20.0],
+        'vehicles_rob' : [3, 0, 0],
+        'phones_rob'   : [0, 1, 1],
+    }
+
+
+@pytest.mark.parametrize('failing', ['write_json_file', 'remove_file'])
+def test_process_infos_retry_adds_the_deltas_once(tmp_path, monkeypatch, failing):
+    # write_json_file: fails before the consumed deltas are recorded, remove_file: fails after the gold swap
+    from hurricane.tasks.process_infos import Infos as InfoTasks
+    from hurricane.utils.datalake import Datalake
+    datalake   = Datalake(None, 'test')
+    info, args = write_silver_model(datalake, str(tmp_path))
+    write_silver(datalake, info, 0, [('a', '2024-01-01', 'vehicles_rob', 10.0)])
+    InfoTasks.process_infos(ti=TaskInstance(True), **args)
+
+    write_silver(datalake, info, 0, [('b', '2024-01-01', 'vehicles_rob', 10.0)])
+    with monkeypatch.context() as patch:
+        function = getattr(Datalake, failing)
+        def fail(self, file_path, *others):
+            if 'consumed' in file_path:
+                raise RuntimeError('simulated failure')
+            return function(self, file_path, *others)
+        patch.setattr(Datalake, failing, fail)
+        with pytest.raises(RuntimeError):
+            InfoTasks.process_infos(ti=TaskInstance(False), **args)
+
+    # the partition tasks of the next run add new rows before the gold task runs again
+    write_silver(datalake, info, 0, [('c', '2024-01-01', 'vehicles_rob', 10.0)])
+    InfoTasks.process_infos(ti=TaskInstance(False), **args)
+    assert info.get_infos_from_gold()['vehicles_rob'].tolist() == [3]
+    assert info.list_infos_deltas_from_silver() == [] and info.list_infos_consumed_from_silver() == []
+    assert not datalake.verify_file_exists(info.silver_consumed_deltas)
+    assert not datalake.verify_file_exists(info.gold_info_pending_file_path)
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from hurricane.data.transform.interfaces import Interface
+
+
+def row_by_row_keys(dataframe, key_columns):
+    # how the keys stored in bronze were built before the column-wise KEY
+    return ["|".join(str(value) for value in row[key_columns]) for _, row in dataframe.iterrows()]
+
+
+def test_create_key_keeps_the_row_by_row_text():
+    dataframe = pd.DataFrame({
+        'ANO_BO'         : pd.array([2020, None, 2021], dtype='Int64'),
+        'VALUE'          : [1.0, np.nan, 0.1 + 0.2],
+        'DATE'           : pd.to_datetime(['2024-01-01 00:00', '2024-01-02 10:30', None]),
+        'NUMERO_BOLETIM' : ['A1', 'B2', None],
+        'KIND'           : pd.Categorical(['p', None, 'q']),
+        'NUM_BO'         : [1, 2, 3],
+    })
+    key_columns = list(dataframe.columns)
+    interface   = Interface(None, None, 'test', {'duplicated_key': key_columns})
+
+    assert interface.create_key(dataframe).tolist() == row_by_row_keys(dataframe, key_columns)
+    assert interface.create_key(dataframe)[0] == '2020|1.0|2024-01-01 00:00:00|A1|p|1'
+
+
+def test_create_key_hash_is_stable_and_distinct():
+    dataframe = pd.DataFrame({'ANO_BO': [2020, 2020, 2021], 'NUM_BO': [1, 1, 1]})
+    interface = Interface(None, None, 'test', {'duplicated_key': ['ANO_BO', 'NUM_BO'], 'key_type': 'hash'})
+
+    keys = interface.create_key(dataframe)
+    assert keys.dtype == np.uint64
+    assert keys[0] == keys[1] and keys[0] != keys[2]
+
+
+def test_create_key_of_empty_dataframe():
+    interface = Interface(None, None, 'test', {'duplicated_key': ['ANO_BO']})
+    assert interface.create_key(pd.DataFrame({'ANO_BO': pd.Series(dtype='int64')})).empty
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from hurricane.utils.sequence import IdSequence
+
+
+def test_assign_ids():
+    dataframe = pd.DataFrame({'lon': [1.0, 2.0, 3.0]}, index=[7, 3, 5])
+
+    result = IdSequence.assign_ids(dataframe, 'ver_id', loc=0)
+    assert list(result.columns) == ['ver_id', 'lon']
+    assert result['ver_id'].tolist() == [1, 2, 3] and result.index.tolist() == [0, 1, 2]
+
+    result = IdSequence.assign_ids(dataframe, 'time_id', start_value=10)
+    assert list(result.columns) == ['lon', 'time_id'] and result['time_id'].tolist() == [10, 11, 12]
+    assert IdSequence.assign_ids(dataframe.iloc[:0], 'time_id').empty
+
+
+def test_allocate_after_the_persisted_high_water_mark(datalake, tmp_path):
+    file_path = str(tmp_path / 'silver' / 'sequences.json')
+    sequence  = IdSequence(datalake, file_path, 'time_id')
+    assert sequence.last_value() is None
+
+    assert sequence.allocate(3).tolist() == [1, 2, 3]
+    assert sequence.allocate(0).tolist() == []
+    # another instance (next run) continues after the mark
+    assert IdSequence(datalake, file_path, 'time_id').allocate(2).tolist() == [4, 5]
+
+    # the sequences of the same file are independent
+    other = IdSequence(datalake, file_path, 'seg_id')
+    assert other.allocate(1).tolist() == [1]
+    assert sequence.last_value() == 5
+
+    sequence.reset()
+    assert sequence.allocate(1).tolist() == [1]
+    assert other.last_value() == 1